@@ -0,0 +1,104 @@
+# Package: s3_process
+# Module: benchmarks/ingest_benchmark.py
+
+# Description: Offline ingest benchmark for s3process.results. Builds synthetic
+# dates.csv content of increasing size, times each parsing path, and reports rows/sec
+# relative to the current per-row process_hours path. Results are written as sorted JSON
+# so runs can be diffed.
+#
+# Usage: python benchmarks/ingest_benchmark.py --output ingest_benchmark.json
+
+
+# ____________________________________________________________________________________
+
+
+import argparse
+import json
+import platform
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from s3process.results import process_hours, process_hours_fast
+
+ROW_COUNTS = [1000, 10000, 100000]
+
+
+# Function Name: make_dates_csv
+# Parameters: rows
+# Purpose: Synthetic dates.csv (EvariNum, Lat, Lon, Date, Dawn, Dusk) content
+# Return: csv string
+def make_dates_csv(rows):
+    rng = np.random.default_rng(0)
+    days = np.datetime64("2025-01-01") + rng.integers(0, 365, rows)
+    dawn = rng.integers(240, 480, rows)
+    dusk = rng.integers(1020, 1260, rows)
+    lines = ["EvariNum,Lat,Lon,Date,Dawn,Dusk"]
+    for i in range(rows):
+        lines.append(
+            f"{i},34.05,-118.25,{days[i]},{dawn[i] // 60:02d}:{dawn[i] % 60:02d},"
+            f"{dusk[i] // 60:02d}:{dusk[i] % 60:02d}"
+        )
+    return "\n".join(lines)
+
+
+# Function Name: run
+# Parameters: row_counts
+# Purpose: Time every dates.csv parsing path for each row count
+# Return: list of records with seconds, rows_per_sec and speedup over process_hours
+def run(row_counts):
+    paths = {
+        "process_hours": process_hours,
+        "process_hours_fast": process_hours_fast,
+    }
+    records = []
+    for rows in row_counts:
+        csv = make_dates_csv(rows)
+        baseline = None
+        for name, fn in paths.items():
+            start = time.perf_counter()
+            df = fn(csv)
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            records.append(
+                {
+                    "path": name,
+                    "rows": rows,
+                    "parsed_rows": len(df),
+                    "seconds": seconds,
+                    "rows_per_sec": rows / seconds,
+                    "speedup": baseline / seconds,
+                }
+            )
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the s3process.results parsers."
+    )
+    parser.add_argument("--output", default="ingest_benchmark.json")
+    parser.add_argument("--rows", type=int, nargs="+", default=ROW_COUNTS)
+    args = parser.parse_args()
+
+    records = run(args.rows)
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "results": records,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    for record in records:
+        print(
+            f"{record['path']:>20} rows={record['rows']:<7} {record['seconds']:.4f}s "
+            f"{record['rows_per_sec']:.0f} rows/s x{record['speedup']:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# Package: s3_process
+# Module: benchmarks/solar_benchmark.py
+
+# Description: Offline benchmark and accuracy regression run for the solar code paths.
+# Sweeps latitudes from the equator to polar regions and dates around DST transitions and
+# solstices, times every path (wall time, events/sec, pysolar evaluations/sec, peak
+# memory) over fleet sizes, and reports the error of each fast path against a pysolar
+# bisection reference that scans the whole local day. Results are written as sorted JSON so runs can be diffed.
+#
+# Usage: python benchmarks/solar_benchmark.py --output solar_benchmark.json
+
+
+# ____________________________________________________________________________________
+
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytz
+
+import s3process.times as times
+from s3process.twilight import calculate_nautical_twilight, calculate_sun_events_array
+
+LONGITUDE = -118.25
+TIMEZONE = "America/Los_Angeles"
+LATITUDES = [0.0, 15.0, 30.0, 45.0, 55.0, 60.0, 65.0, 70.0, 78.0]
+DATES = [
+    date(2025, 3, 8),
+    date(2025, 3, 9),  # DST starts
+    date(2025, 3, 20),
+    date(2025, 6, 21),
+    date(2025, 11, 1),
+    date(2025, 11, 2),  # DST ends
+    date(2025, 12, 21),
+]
+FLEET_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+
+# Class Name: AltitudeCounter
+# Purpose: Count pysolar get_altitude calls made through s3process.times
+class AltitudeCounter:
+    def __init__(self):
+        self.calls = 0
+        self.original = times.get_altitude
+
+    def __enter__(self):
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return self.original(*args, **kwargs)
+
+        times.get_altitude = counted
+        return self
+
+    def __exit__(self, *exc):
+        times.get_altitude = self.original
+
+
+# Function Name: measure
+# Parameters: fn, events (number of dawn/dusk events fn produces)
+# Purpose: Run fn once while tracking wall time, peak memory and pysolar calls
+# Return: fn result, dict of measurements
+def measure(fn, events):
+    tracemalloc.start()
+    with AltitudeCounter() as counter:
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {
+        "events": events,
+        "seconds": seconds,
+        "events_per_sec": events / seconds if seconds else None,
+        "altitude_evals": counter.calls,
+        "altitude_evals_per_sec": counter.calls / seconds if seconds else None,
+        "peak_memory_bytes": peak,
+    }
+
+
+# Function Name: pysolar_reference
+# Parameters: lat, lon, day, tz, twilight_altitude
+# Purpose: Reference dawn/dusk from pysolar only: a 10 minute altitude grid over the local
+# day brackets the first rising and last setting crossing, which are then bisected
+# Return: dawn, dusk (None where the sun does not cross twilight_altitude that day)
+def pysolar_reference(lat, lon, day, tz, twilight_altitude):
+    midnight = tz.localize(datetime(day.year, day.month, day.day))
+    grid = [midnight + timedelta(minutes=10 * step) for step in range(24 * 6 + 1)]
+    above = [
+        times.calculate_altitude(lat, lon, moment) > twilight_altitude
+        for moment in grid
+    ]
+
+    dawn = dusk = None
+    for i in range(len(grid) - 1):
+        if dawn is None and not above[i] and above[i + 1]:
+            dawn = times.bisect_twilight(
+                lat, lon, grid[i], grid[i + 1], "dawn", twilight_altitude
+            )
+        if above[i] and not above[i + 1]:
+            dusk = times.bisect_twilight(
+                lat, lon, grid[i], grid[i + 1], "dusk", twilight_altitude
+            )
+    return dawn, dusk
+
+
+# Function Name: compare
+# Parameters: value, reference (datetimes, pandas Timestamps or None/NaT)
+# Purpose: Absolute difference in seconds, or a mismatch when only one side has an event
+# Return: error seconds (None if not comparable), mismatch flag
+def compare(value, reference):
+    value_missing = value is None or pd.isna(value)
+    reference_missing = reference is None or pd.isna(reference)
+    if value_missing or reference_missing:
+        return None, value_missing != reference_missing
+    return abs((pd.Timestamp(value) - pd.Timestamp(reference)).total_seconds()), False
+
+
+# Function Name: run_accuracy
+# Parameters: None
+# Purpose: Compare every fast path with the pysolar bisection reference on the sweep
+# Return: list of per (latitude, date, path) max error records
+def run_accuracy():
+    records = []
+    tz = pytz.timezone(TIMEZONE)
+    for lat in LATITUDES:
+        batch_dawn, batch_dusk = times.find_civil_twilight_batch(
+            lat, LONGITUDE, DATES, TIMEZONE
+        )
+        events = calculate_sun_events_array(DATES, lat, LONGITUDE)
+        for i, day in enumerate(DATES):
+            reference = pysolar_reference(lat, LONGITUDE, day, tz, -6.0)
+            candidates = {
+                "scan": times.find_civil_twilight(lat, LONGITUDE, day, TIMEZONE),
+                "bisect": times.find_civil_twilight(
+                    lat, LONGITUDE, day, TIMEZONE, method="bisect"
+                ),
+                "fast": times.find_civil_twilight(
+                    lat, LONGITUDE, day, TIMEZONE, precision="fast"
+                ),
+                "precise": times.find_civil_twilight(
+                    lat, LONGITUDE, day, TIMEZONE, precision="precise"
+                ),
+                "batch": (batch_dawn[i], batch_dusk[i]),
+                "sun_events_array": sun_events_local(events, i, "civil", day, tz),
+            }
+            for path, value in candidates.items():
+                records.append(accuracy_record(path, lat, day, value, reference))
+
+            # Nautical twilight (-12 degrees) from the array calculator
+            nautical_reference = pysolar_reference(lat, LONGITUDE, day, tz, -12.0)
+            nautical = sun_events_local(events, i, "nautical", day, tz)
+            records.append(
+                accuracy_record(
+                    "sun_events_array_nautical", lat, day, nautical, nautical_reference
+                )
+            )
+    return records
+
+
+# Function Name: sun_events_local
+# Purpose: Dawn/dusk of one calculate_sun_events_array row as local datetimes on day
+# Return: dawn, dusk (None where the event does not occur)
+def sun_events_local(events, i, name, day, tz):
+    return tuple(
+        (
+            None
+            if np.isnat(value)
+            else times.move_to_local_date(value.astype(datetime), day, tz)
+        )
+        for value in (events[name + "_dawn"][i], events[name + "_dusk"][i])
+    )
+
+
+# Function Name: accuracy_record
+# Purpose: Build one accuracy record for a path against the reference dawn/dusk
+# Return: dict
+def accuracy_record(path, lat, day, value, reference):
+    dawn_error, dawn_mismatch = compare(value[0], reference[0])
+    dusk_error, dusk_mismatch = compare(value[1], reference[1])
+    errors = [error for error in (dawn_error, dusk_error) if error is not None]
+    return {
+        "path": path,
+        "latitude": lat,
+        "date": day.isoformat(),
+        "dawn_error_seconds": dawn_error,
+        "dusk_error_seconds": dusk_error,
+        "max_error_seconds": max(errors) if errors else None,
+        "mismatches": int(dawn_mismatch) + int(dusk_mismatch),
+    }
+
+
+# Function Name: run_throughput
+# Parameters: fleet_sizes, max_scalar (largest fleet size run through scalar pysolar paths)
+# Purpose: Time every path for each fleet size on one date per light
+# Return: list of throughput records
+def run_throughput(fleet_sizes, max_scalar):
+    rng = np.random.default_rng(0)
+    day = date(2025, 6, 21)
+    records = []
+    for size in fleet_sizes:
+        lats = rng.uniform(-60, 60, size)
+        lons = rng.uniform(-125, -65, size)
+        paths = {
+            "batch": lambda: times.find_civil_twilight_batch(lats, lons, day, TIMEZONE),
+            "sun_events_array": lambda: calculate_sun_events_array(
+                np.full(size, np.datetime64(day)), lats, lons
+            ),
+        }
+        if size <= max_scalar:
+            for name, kwargs in {
+                "scan": {},
+                "bisect": {"method": "bisect"},
+                "fast": {"precision": "fast"},
+                "precise": {"precision": "precise"},
+            }.items():
+                paths[name] = lambda kwargs=kwargs: [
+                    times.find_civil_twilight(lat, lon, day, TIMEZONE, **kwargs)
+                    for lat, lon in zip(lats, lons)
+                ]
+            paths["nautical_twilight"] = lambda: [
+                calculate_nautical_twilight(lat, lon, days=1)
+                for lat, lon in zip(lats, lons)
+            ]
+        for name, fn in paths.items():
+            _, stats = measure(fn, 2 * size)
+            records.append({"path": name, "fleet_size": size, **stats})
+    return records
+
+
+# Function Name: summarize
+# Parameters: accuracy records
+# Purpose: Max error and missed/extra event count per path over the whole sweep
+# Return: dict of path -> {"max_error_seconds", "mismatches"}
+def summarize(accuracy):
+    summary = {}
+    for record in accuracy:
+        path = summary.setdefault(
+            record["path"], {"max_error_seconds": 0.0, "mismatches": 0}
+        )
+        if record["max_error_seconds"] is not None:
+            path["max_error_seconds"] = max(
+                path["max_error_seconds"], record["max_error_seconds"]
+            )
+        path["mismatches"] += record["mismatches"]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the s3process solar code paths."
+    )
+    parser.add_argument("--output", default="solar_benchmark.json")
+    parser.add_argument("--fleet-sizes", type=int, nargs="+", default=FLEET_SIZES)
+    parser.add_argument("--max-scalar", type=int, default=10)
+    args = parser.parse_args()
+
+    # find_civil_twilight prints its hourly boundaries, keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        accuracy = run_accuracy()
+        throughput = run_throughput(args.fleet_sizes, args.max_scalar)
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "summary": summarize(accuracy),
+        "accuracy": accuracy,
+        "throughput": throughput,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True, default=str)
+
+    print(json.dumps(report["summary"], indent=2, sort_keys=True))
+    for record in throughput:
+        print(
+            f"{record['path']:>20} n={record['fleet_size']:<7} {record['seconds']:.4f}s "
+            f"{record['events_per_sec']:.0f} events/s {record['peak_memory_bytes'] / 1e6:.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
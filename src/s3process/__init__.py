@@ -1,2 +1,10 @@
 # __inti__.py -> Importing required libraries for use in import *
-__all__ = ["results", "events", "street_lights", "times", "ubiquita"]
+__all__ = [
+    "results",
+    "events",
+    "street_lights",
+    "times",
+    "ubiquita",
+    "cache",
+    "sessions",
+]
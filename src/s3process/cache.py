@@ -0,0 +1,245 @@
+# Package: s3_process
+# Module: cache.py
+
+# Description: Cache dawn/dusk results so repeat scheduling runs and warm Lambda
+# invocations skip the solar math. Results are kept in an in-process LRU and in a
+# SQLite file, keyed by quantized lat/lon, date, timezone and twilight altitude.
+# Entries are evicted by age and by count in both layers.
+
+
+# ____________________________________________________________________________________
+
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pytz
+
+from s3process.times import find_civil_twilight
+from s3process.twilight import (
+    calculate_nautical_dawn,
+    calculate_nautical_dusk,
+    format_date,
+    format_time,
+)
+
+# Default SQLite location -> /tmp survives warm starts on Lambda
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get("S3PROCESS_CACHE_DIR", tempfile.gettempdir()),
+    "s3process_twilight.sqlite",
+)
+
+
+# Class Name: TwilightCache
+# Parameters: path (SQLite file, None for memory only), memory_entries, max_entries,
+# max_age_seconds, precision (decimal places lat/lon are quantized to)
+# Purpose: Two level cache (LRU + SQLite) of JSON serializable twilight results
+class TwilightCache:
+    def __init__(
+        self,
+        path=DEFAULT_CACHE_PATH,
+        memory_entries=1024,
+        max_entries=100000,
+        max_age_seconds=30 * 24 * 3600,
+        precision=4,
+    ):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.precision = precision
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.connection = None
+        if path:
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS twilight "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS twilight_created ON twilight (created)"
+            )
+            self.connection.commit()
+
+    # Function Name: make_key
+    # Purpose: Build a cache key from quantized lat/lon, date, timezone and altitude
+    # Return: key string
+    def make_key(self, kind, lat, lon, date, timezone, twilight_altitude, variant=""):
+        return "|".join(
+            [
+                kind,
+                f"{round(float(lat), self.precision):.{self.precision}f}",
+                f"{round(float(lon), self.precision):.{self.precision}f}",
+                date.strftime("%Y-%m-%d"),
+                str(timezone),
+                f"{float(twilight_altitude):.3f}",
+                str(variant),
+            ]
+        )
+
+    # Function Name: get
+    # Purpose: Look a key up in memory, then on disk, dropping expired entries
+    # Return: cached value, or None if missing or expired
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            if key in self.memory:
+                value, created = self.memory[key]
+                if now - created <= self.max_age_seconds:
+                    self.memory.move_to_end(key)
+                    return value
+                del self.memory[key]
+            if self.connection is None:
+                return None
+            row = self.connection.execute(
+                "SELECT value, created FROM twilight WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                return None
+            value = json.loads(row[0])
+            self._remember(key, value, row[1])
+            return value
+
+    # Function Name: set
+    # Purpose: Store a value in both layers and periodically evict old entries
+    # Return: None
+    def set(self, key, value):
+        now = time.time()
+        with self.lock:
+            self._remember(key, value, now)
+            if self.connection is None:
+                return
+            self.connection.execute(
+                "INSERT OR REPLACE INTO twilight (key, value, created) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now),
+            )
+            self.connection.commit()
+            self.writes += 1
+            if self.writes % 100 == 0:
+                self._evict(now)
+
+    # Function Name: evict
+    # Purpose: Remove entries older than max_age_seconds and beyond max_entries
+    # Return: None
+    def evict(self):
+        with self.lock:
+            self._evict(time.time())
+
+    # Function Name: clear
+    # Purpose: Drop every cached entry
+    # Return: None
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.connection is not None:
+                self.connection.execute("DELETE FROM twilight")
+                self.connection.commit()
+
+    def _remember(self, key, value, created):
+        self.memory[key] = (value, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict(self, now):
+        if self.connection is None:
+            return
+        self.connection.execute(
+            "DELETE FROM twilight WHERE created < ?", (now - self.max_age_seconds,)
+        )
+        self.connection.execute(
+            "DELETE FROM twilight WHERE key NOT IN "
+            "(SELECT key FROM twilight ORDER BY created DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+        self.connection.commit()
+
+
+# Shared cache created on first use
+_default_cache = None
+
+
+# Function Name: get_default_cache
+# Parameters: None
+# Purpose: Lazily create the module level cache shared by the cached_* functions
+# Return: TwilightCache
+def get_default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TwilightCache()
+    return _default_cache
+
+
+# Function Name: cached_find_civil_twilight
+# Parameters: same as times.find_civil_twilight, plus optional cache
+# Purpose: find_civil_twilight with results served from the twilight cache
+# Return: civil_dawn, civil_dusk localized to timezone (None if not found)
+def cached_find_civil_twilight(
+    lat,
+    lon,
+    date,
+    timezone,
+    dem_path=None,
+    twilight_altitude=-6.0,
+    cache=None,
+    **kwargs,
+):
+    cache = cache or get_default_cache()
+    variant = json.dumps({"dem_path": dem_path, **kwargs}, sort_keys=True)
+    key = cache.make_key("civil", lat, lon, date, timezone, twilight_altitude, variant)
+
+    value = cache.get(key)
+    if value is None:
+        civil_dawn, civil_dusk = find_civil_twilight(
+            lat, lon, date, timezone, dem_path, twilight_altitude, **kwargs
+        )
+        value = [
+            civil_dawn.isoformat() if civil_dawn else None,
+            civil_dusk.isoformat() if civil_dusk else None,
+        ]
+        cache.set(key, value)
+
+    tz = pytz.timezone(timezone)
+    return tuple(
+        datetime.fromisoformat(item).astimezone(tz) if item else None for item in value
+    )
+
+
+# Function Name: cached_nautical_twilight
+# Parameters: same as twilight.calculate_nautical_twilight, plus optional cache
+# Purpose: calculate_nautical_twilight with every day served from the twilight cache
+# Return: List of dictionaries containing date, nautical dawn, and nautical dusk times
+def cached_nautical_twilight(latitude, longitude, elevation=0, days=5, cache=None):
+    cache = cache or get_default_cache()
+    results = []
+    today = datetime.now()
+
+    for i in range(days):
+        date = today + timedelta(days=i)
+        key = cache.make_key(
+            "nautical", latitude, longitude, date, "UTC", -12, elevation
+        )
+
+        day = cache.get(key)
+        if day is None:
+            day = {
+                "date": format_date(date),
+                "nautical_dawn": format_time(
+                    calculate_nautical_dawn(date, latitude, longitude, elevation)
+                ),
+                "nautical_dusk": format_time(
+                    calculate_nautical_dusk(date, latitude, longitude, elevation)
+                ),
+            }
+            cache.set(key, day)
+        results.append(day)
+
+    return results
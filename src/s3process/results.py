@@ -12,23 +12,270 @@
 # ____________________________________________________________________________________
 
 
+import gzip
+import hashlib
+import io
+import json
+import mmap
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import pytz
 
+# Default download cache location -> /tmp survives warm starts on Lambda
+DEFAULT_DOWNLOAD_CACHE_DIR = os.path.join(
+    os.environ.get("S3PROCESS_CACHE_DIR", tempfile.gettempdir()), "s3process_downloads"
+)
+
+
+# Class Name: DownloadCache
+# Parameters: directory, max_bytes (total size of cached bodies before eviction)
+# Purpose: On-disk cache of downloaded csv bodies keyed by url, storing ETag and
+# Last-Modified so get can send conditional requests and reuse the body on 304
+class DownloadCache:
+    def __init__(
+        self, directory=DEFAULT_DOWNLOAD_CACHE_DIR, max_bytes=512 * 1024 * 1024
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    # Function Name: paths
+    # Purpose: Body and metadata file paths for a url
+    # Return: body path, meta path
+    def paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return (
+            os.path.join(self.directory, key + ".body"),
+            os.path.join(self.directory, key + ".json"),
+        )
+
+    # Function Name: meta
+    # Purpose: Cached ETag/Last-Modified metadata for a url
+    # Return: dict, or None if the url is not cached
+    def meta(self, url):
+        body_path, meta_path = self.paths(url)
+        if not (os.path.exists(body_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path, "r") as f:
+            return json.load(f)
+
+    # Function Name: conditional_headers
+    # Purpose: If-None-Match / If-Modified-Since headers for a cached url
+    # Return: dict of headers (empty if not cached)
+    def conditional_headers(self, url):
+        meta = self.meta(url)
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    # Function Name: load
+    # Purpose: Read a cached body and mark it as recently used
+    # Return: body text, or None if not cached
+    def load(self, url):
+        body_path, _ = self.paths(url)
+        try:
+            with open(body_path, "r", encoding="utf-8", newline="") as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(body_path)
+        return body
+
+    # Function Name: store
+    # Purpose: Save a 200 response body with its validators, then evict to max_bytes.
+    # Responses without ETag or Last-Modified can never be revalidated and are not kept
+    # Return: None
+    def store(self, url, response):
+        body_path, meta_path = self.paths(url)
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        if not (meta["etag"] or meta["last_modified"]):
+            # Drop an older entry for the url, it no longer matches the object
+            for path in (body_path, meta_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            return
+        # Write to temp files first so readers never see a partial body
+        with open(body_path + ".tmp", "w", encoding="utf-8", newline="") as f:
+            f.write(response.text)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(body_path + ".tmp", body_path)
+        os.replace(meta_path + ".tmp", meta_path)
+        self.evict()
+
+    # Function Name: evict
+    # Purpose: Remove least recently used bodies until the cache fits in max_bytes
+    # Return: None
+    def evict(self):
+        evict_files(self.directory, ".body", self.max_bytes, companion=".json")
+
+
+# Function Name: evict_files
+# Parameters: directory, suffix of cached files, max_bytes, companion suffix to remove
+# alongside each evicted file
+# Purpose: Remove least recently used (oldest mtime) files until they fit in max_bytes
+# Return: None
+def evict_files(directory, suffix, max_bytes, companion=None):
+    files = []
+    for name in os.listdir(directory):
+        if name.endswith(suffix):
+            stat = os.stat(os.path.join(directory, name))
+            files.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in files)
+    for _, size, name in sorted(files):
+        if total <= max_bytes:
+            break
+        paths = [name]
+        if companion:
+            paths.append(name[: -len(suffix)] + companion)
+        for path in paths:
+            try:
+                os.remove(os.path.join(directory, path))
+            except FileNotFoundError:
+                pass
+        total -= size
+
+
+# Default parsed frame cache location
+DEFAULT_FRAME_CACHE_DIR = os.path.join(
+    os.environ.get("S3PROCESS_CACHE_DIR", tempfile.gettempdir()), "s3process_frames"
+)
+
+
+# Class Name: FrameCache
+# Parameters: directory, max_bytes (total size of cached frames before eviction)
+# Purpose: Persist parsed pandas dfs as uncompressed, single chunk Feather (Arrow IPC)
+# files keyed by source url, ETag and parse options, and reopen them memory-mapped
+# (copy-on-write). Integer and float columns without nulls (typed frames) are returned
+# as zero-copy views of the mapping, other columns are copied into pandas. Requires
+# pyarrow (pip install s3process[columnar])
+class FrameCache:
+    def __init__(
+        self, directory=DEFAULT_FRAME_CACHE_DIR, max_bytes=2 * 1024 * 1024 * 1024
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    # Function Name: path
+    # Purpose: Feather file path for a url, validator (ETag/Last-Modified) and options
+    # Return: path string
+    def path(self, url, validator, options):
+        key = json.dumps([url, validator, options], sort_keys=True, default=str)
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + ".feather")
+
+    # Function Name: load
+    # Purpose: Memory-map a cached frame and mark it as recently used. The mapping is
+    # private, so writes to the returned df never reach the cached file
+    # Return: pandas df, or None if not cached
+    def load(self, url, validator, options):
+        path = self.path(url, validator, options)
+        try:
+            with open(path, "rb") as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return table_to_frame(mapping)
+
+    # Function Name: store
+    # Purpose: Write a parsed frame uncompressed and as one chunk (so columns can be
+    # mapped without copies), then evict
+    # Return: None
+    def store(self, url, validator, options, df):
+        from pyarrow import feather
+
+        path = self.path(url, validator, options)
+        feather.write_feather(
+            df.reset_index(drop=True),
+            path + ".tmp",
+            compression="uncompressed",
+            chunksize=max(len(df), 1),
+        )
+        os.replace(path + ".tmp", path)
+        evict_files(self.directory, ".feather", self.max_bytes)
+
+
+# Function Name: table_to_frame
+# Parameters: mapping (mmap of an uncompressed Arrow IPC / Feather file)
+# Purpose: Read the file into pandas without copying single chunk integer/float columns
+# that have no nulls -> those become numpy arrays over the mapping itself, the remaining
+# columns go through to_pandas (keeping tz, category, ...)
+# Return: pandas df with the file's column order
+def table_to_frame(mapping):
+    import pyarrow as pa
+
+    source = pa.py_buffer(mapping)
+    table = pa.ipc.open_file(source).read_all()
+
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if not (
+            column.num_chunks == 1
+            and column.null_count == 0
+            and (pa.types.is_integer(column.type) or pa.types.is_floating(column.type))
+        ):
+            continue
+        chunk = column.chunk(0)
+        dtype = np.dtype(column.type.to_pandas_dtype())
+        data = chunk.buffers()[1]
+        offset = data.address - source.address + chunk.offset * dtype.itemsize
+        # Arrays are built on the mmap, not the immutable Arrow buffer, so they stay
+        # writable (copy-on-write) and keep the mapping alive
+        if 0 <= offset and offset + len(chunk) * dtype.itemsize <= len(mapping):
+            columns[name] = np.frombuffer(
+                mapping, dtype=dtype, count=len(chunk), offset=offset
+            )
+    rest = [name for name in table.column_names if name not in columns]
+    if rest:
+        converted = table.select(rest).to_pandas()
+        columns.update({name: converted[name] for name in rest})
+    return pd.DataFrame(
+        {name: columns[name] for name in table.column_names}, copy=False
+    )
+
 
 # Function Name: get
-# Parameters: S3 url .csv file
+# Parameters: S3 url .csv file, cache (optional DownloadCache)
 # Purpose: Using url to a s3 bucket, download the .csv file, and
-# return the message content
-# Return: If status_code is 200 then response.text, else False
-def get(url):
+# return the message content. With a cache, sends a conditional request and serves the
+# cached body when S3 answers 304 Not Modified
+# Return: If status_code is 200 (or 304 with a cached body) then response.text, else False
+def get(url, cache=None):
+    # Send the cached validators along, if any
+    headers = cache.conditional_headers(url) if cache else {}
     # Get response using requests to url
-    response = requests.get(url)
+    response = requests.get(url, headers=headers)
+    # Unchanged since the last download, reuse the cached body
+    if response.status_code == 304 and cache:
+        output = cache.load(url)
+        if output is not None:
+            return output
+        # Cached body vanished between the request and now, download it again
+        response = requests.get(url)
     # If 200, proceed to processing
     if response.status_code == 200:
-        # Grab the content and return it to user, don't save .csv
+        # Keep the body and validators for the next conditional request
+        if cache:
+            cache.store(url, response)
+        # Grab the content and return it to user
         output = response.text
         return output
     # Grab other code and send to user
@@ -37,12 +284,63 @@ def get(url):
         return False
 
 
+# Function Name: compact_ids
+# Parameters: pandas series of EvariNum strings
+# Purpose: Convert ids to int64 when every id round-trips as an integer (no leading zeros
+# or decimals), otherwise to a category
+# Return: converted pandas series
+def compact_ids(ids):
+    numeric = pd.to_numeric(ids, errors="coerce")
+    if numeric.notna().all() and (numeric % 1 == 0).all():
+        integers = numeric.astype("int64")
+        if (integers.astype(str) == ids.astype(str).str.strip()).all():
+            return integers
+    return ids.astype("category")
+
+
+# Function Name: dim_levels
+# Parameters: pandas series of DIM values (strings or numbers)
+# Purpose: Validate DIM values and convert them to uint8
+# Return: uint8 pandas series, raises ValueError unless every value is an integer
+# between 0 and 255
+def dim_levels(values):
+    dim_values = pd.to_numeric(values, errors="coerce")
+    if (
+        dim_values.isna().any()
+        or not dim_values.between(0, 255).all()
+        or (dim_values % 1 != 0).any()
+    ):
+        raise ValueError("DIM must be an integer between 0 and 255")
+    return dim_values.astype("uint8")
+
+
+# Function Name: apply_results_schema
+# Parameters: results pandas df (EvariNum, DIM, SUM as strings)
+# Purpose: Validate and convert results columns to compact types -> EvariNum int64 or
+# category, DIM uint8, SUM float64
+# Return: typed pandas df, raises ValueError on invalid DIM or SUM values
+def apply_results_schema(df):
+    evari, dim, total = df.columns
+    dim_values = dim_levels(df[dim])
+    sum_values = pd.to_numeric(df[total], errors="coerce")
+    if sum_values.isna().any():
+        raise ValueError("SUM must be numeric")
+    return pd.DataFrame(
+        {
+            evari: compact_ids(df[evari]),
+            dim: dim_values,
+            total: sum_values.astype("float64"),
+        },
+        index=df.index,
+    )
+
+
 # Function Name: process_results
-# Parameters: csv response content from url
+# Parameters: csv response content from url, typed (apply_results_schema to the df)
 # Purpose: Process a requests message body for csv results content and convert to pandas
 # datafrmae
 # Return: If array content, pandas df obj, else False
-def process_results(csv):
+def process_results(csv, typed=False):
     try:
         # Split message into lines
         lines = csv.splitlines()
@@ -61,6 +359,8 @@ def process_results(csv):
             # Try converting to pandas df or error out
             if len(header_new) == 3:
                 df = pd.DataFrame(data, columns=header_new)
+                if typed:
+                    df = apply_results_schema(df)
                 return df
             else:
                 print("Error in csv data, not following EvariNum, Dim, SUM header")
@@ -74,6 +374,140 @@ def process_results(csv):
         return False
 
 
+# Function Name: fetch
+# Parameters: S3 url, parts (parallel Range requests), min_part_size in bytes, session
+# (optional requests.Session to pool connections across calls)
+# Purpose: Download an object into one preallocated buffer, splitting objects larger
+# than 2 * min_part_size into parallel HTTP Range requests that each read straight into
+# their slice, then transparently decompress gzip/zstd bodies (results.csv.gz)
+# Return: bytes-like body (decode() for process_results, or io.BytesIO for
+# process_results_stream), else False
+def fetch(url, parts=8, min_part_size=8 * 1024 * 1024, session=None):
+    # Pool connections over a session of our own, closed once the download is done
+    if session is None:
+        with requests.Session() as session:
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(parts, 1))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            return fetch(url, parts, min_part_size, session)
+
+    # Ask for the stored bytes, compression is undone locally on the whole body
+    identity = {"Accept-Encoding": "identity"}
+    head = session.head(url, headers=identity)
+    if head.status_code != 200:
+        print(head.status_code)
+        return False
+    size = int(head.headers.get("Content-Length", 0))
+    ranged = (
+        parts > 1
+        and head.headers.get("Accept-Ranges") == "bytes"
+        and size >= 2 * min_part_size
+    )
+
+    if ranged:
+        body = bytearray(size)
+        view = memoryview(body)
+        part_size = max(min_part_size, -(-size // parts))
+        ranges = [
+            (start, min(start + part_size, size)) for start in range(0, size, part_size)
+        ]
+
+        # Read each range directly into its slice of the buffer, no reassembly copy.
+        # A failed part prints its status and reports False like the single GET
+        def download(part):
+            start, end = part
+            headers = dict(identity, Range=f"bytes={start}-{end - 1}")
+            response = session.get(url, headers=headers, stream=True)
+            with response:
+                if response.status_code != 206:
+                    print(response.status_code)
+                    return False
+                offset = start
+                while offset < end:
+                    read = response.raw.readinto(view[offset:end])
+                    if not read:
+                        break
+                    offset += read
+            if offset != end:
+                print(f"Incomplete range {start}-{end - 1}")
+                return False
+            return True
+
+        with ThreadPoolExecutor(max_workers=parts) as executor:
+            if not all(list(executor.map(download, ranges))):
+                return False
+    else:
+        response = session.get(url, headers=identity)
+        if response.status_code != 200:
+            print(response.status_code)
+            return False
+        body = response.content
+
+    return decompress(body)
+
+
+# Function Name: decompress
+# Parameters: bytes-like body
+# Purpose: Detect gzip/zstd by magic bytes and decompress, plain bodies pass through.
+# zstd needs the zstandard package (pip install s3process[zstd])
+# Return: bytes-like body
+def decompress(body):
+    if body[:2] == b"\x1f\x8b":
+        return gzip.decompress(body)
+    if body[:4] == b"\x28\xb5\x2f\xfd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)).read()
+    return body
+
+
+# Function Name: get_stream
+# Parameters: S3 url .csv file, chunk_size in bytes (network read size)
+# Purpose: Using url to a s3 bucket, open a streaming download of the .csv file so it
+# can be parsed incrementally instead of held in memory as one string
+# Return: If status_code is 200 then a file-like response body, else False
+def get_stream(url, chunk_size=1 << 20):
+    # Get streamed response using requests to url
+    response = requests.get(url, stream=True)
+    # If 200, hand the raw body over for chunked parsing
+    if response.status_code == 200:
+        # Undo gzip/deflate transfer encoding while reading
+        response.raw.decode_content = True
+        # Keep the body open at EOF so the buffered wrapper can finish reading it
+        response.raw.auto_close = False
+        return io.BufferedReader(response.raw, buffer_size=chunk_size)
+    # Grab other code and send to user
+    else:
+        print(response.status_code)
+        response.close()
+        return False
+
+
+# Function Name: process_results_stream
+# Parameters: file-like csv body (get_stream or open file), chunk_rows, typed
+# Purpose: Parse results csv content incrementally, chunk_rows rows at a time, so memory
+# stays flat as results.csv grows. The stream is closed (releasing a get_stream
+# connection) once the generator finishes, fails or is closed
+# Return: generator of pandas df chunks with the same columns as process_results
+def process_results_stream(stream, chunk_rows=100000, typed=False):
+    reader = None
+    try:
+        # Keep values as strings, matching process_results
+        reader = pd.read_csv(
+            stream, chunksize=chunk_rows, dtype=str, keep_default_na=False
+        )
+        for df in reader:
+            # Header should follow EvariNum, DIM, SUM
+            if len(df.columns) != 3:
+                print("Error in csv data, not following EvariNum, Dim, SUM header")
+                return
+            yield apply_results_schema(df) if typed else df
+    finally:
+        if reader is not None:
+            reader.close()
+        stream.close()
+
+
 # Function Name: process_datetime
 # Parameters: List of turn on and turn off times in timezone los angeles
 # Purpose: Convert data in table to PST
@@ -133,3 +567,140 @@ def process_hours(csv):
         print("Ouput in df processing")
         print(e)
         return False
+
+
+# Function Name: process_hours_fast
+# Parameters: csv response content from url, timezone (pytz/IANA name) of the times,
+# typed (EvariNum as int64 or category via compact_ids)
+# Purpose: Vectorized process_hours -> parses the whole dates.csv with pandas and
+# localizes the DawnDatetime and DuskDatetime columns at once instead of per row
+# Return: If array content, pandas df obj, else False
+def process_hours_fast(csv, timezone="America/Los_Angeles", typed=False):
+    try:
+        # Assuming more than two lines exist, process them
+        if not csv or len(csv.strip().splitlines()) < 2:
+            print("No output in csv object")
+            return False
+        # Skip the header, columns are used by position like process_datetime
+        data = pd.read_csv(
+            io.StringIO(csv), header=None, skiprows=1, dtype=str, keep_default_na=False
+        )
+        # Build dawn and dusk columns for the whole file at once
+        dawn = pd.to_datetime(data[3] + " " + data[4], format="%Y-%m-%d %H:%M")
+        dusk = pd.to_datetime(data[3] + " " + data[5], format="%Y-%m-%d %H:%M")
+        # Match pytz localize: standard time for ambiguous times, shift nonexistent ones
+        ambiguous = np.zeros(len(data), dtype=bool)
+        df = pd.DataFrame(
+            {
+                "EvariNum": compact_ids(data[0]) if typed else data[0],
+                "DawnDatetime": dawn.dt.tz_localize(
+                    timezone, ambiguous=ambiguous, nonexistent=pd.Timedelta(hours=1)
+                ),
+                "DuskDatetime": dusk.dt.tz_localize(
+                    timezone, ambiguous=ambiguous, nonexistent=pd.Timedelta(hours=1)
+                ),
+            }
+        )
+        return df
+    except Exception as e:
+        print("Ouput in df processing")
+        print(e)
+        return False
+
+
+# Function Name: load_frame
+# Parameters: S3 url .csv file, kind ("results" or "hours"), frame_cache (FrameCache),
+# download_cache (optional DownloadCache), parser options (typed, timezone)
+# Purpose: Return the parsed df for url, reusing the cached columnar copy while the
+# object's ETag (or Last-Modified) is unchanged so the csv is not parsed again
+# Return: pandas df, or False if the download or parsing failed
+def load_frame(url, kind="results", frame_cache=None, download_cache=None, **options):
+    parsers = {"results": process_results, "hours": process_hours_fast}
+    parser = parsers[kind]
+    options = dict(options, kind=kind)
+
+    # HEAD is enough to learn whether the object changed
+    validator = None
+    if frame_cache:
+        head = requests.head(url)
+        if head.status_code == 200:
+            validator = head.headers.get("ETag") or head.headers.get("Last-Modified")
+        if validator:
+            df = frame_cache.load(url, validator, options)
+            if df is not None:
+                return df
+
+    # Not cached (or no validator), download and parse as usual
+    csv = get(url, cache=download_cache)
+    if csv is False:
+        return False
+    df = parser(csv, **{key: value for key, value in options.items() if key != "kind"})
+    if df is not False and frame_cache and validator:
+        frame_cache.store(url, validator, options, df)
+    return df
+
+
+# Class Name: LightSchedule
+# Parameters: table (pandas df indexed by id with dim, on_time, off_time columns),
+# unmatched_results, unmatched_hours (ids only present in one of the two frames)
+# Purpose: Compact joined schedule with O(1) lookup of every row for an EvariNum
+class LightSchedule:
+    def __init__(self, table, unmatched_results, unmatched_hours):
+        self.table = table
+        self.unmatched_results = unmatched_results
+        self.unmatched_hours = unmatched_hours
+        # Hash of id -> row positions, built once
+        self.positions = table.groupby(level=0, observed=True).indices
+
+    # Function Name: lookup
+    # Purpose: All schedule rows (one per date) for an EvariNum
+    # Return: pandas df, empty if the id is not scheduled
+    def lookup(self, evari_num):
+        if self.table.index.dtype.kind in "iu":
+            # Ids that cannot be integers of the index dtype are never scheduled
+            try:
+                key = self.table.index.dtype.type(evari_num)
+            except (ValueError, TypeError, OverflowError):
+                return self.table.iloc[[]]
+        else:
+            key = str(evari_num)
+        return self.table.iloc[self.positions.get(key, [])]
+
+    def __contains__(self, evari_num):
+        return not self.lookup(evari_num).empty
+
+    def __len__(self):
+        return len(self.table)
+
+
+# Function Name: build_schedule
+# Parameters: results pandas df (process_results), hours pandas df (process_hours)
+# Purpose: Index both frames by EvariNum and hash-join them into one schedule table
+# (id, dim, on_time at dusk, off_time at dawn), reporting ids missing from either side
+# Return: LightSchedule, raises ValueError on invalid DIM values
+def build_schedule(results_df, hours_df):
+    # Join on string ids so typed and untyped frames line up
+    results = pd.DataFrame(
+        {
+            "id": results_df.iloc[:, 0].astype(str).str.strip(),
+            "dim": dim_levels(results_df.iloc[:, 1]),
+        }
+    )
+    hours = pd.DataFrame(
+        {
+            "id": hours_df["EvariNum"].astype(str).str.strip(),
+            "on_time": hours_df["DuskDatetime"],
+            "off_time": hours_df["DawnDatetime"],
+        }
+    )
+    table = hours.merge(results, on="id", how="inner", sort=False)
+
+    # Ids present on only one side
+    result_ids = pd.Index(results["id"].unique())
+    hour_ids = pd.Index(hours["id"].unique())
+    unmatched_results = result_ids.difference(hour_ids).tolist()
+    unmatched_hours = hour_ids.difference(result_ids).tolist()
+
+    table["id"] = compact_ids(table["id"])
+    table = table.set_index("id")[["dim", "on_time", "off_time"]]
+    return LightSchedule(table, unmatched_results, unmatched_hours)
@@ -0,0 +1,287 @@
+# Package: s3_process
+# Module: sessions.py
+
+# Description: Shared, lazily created requests session for the SmartLinx (street_lights)
+# and Ubiquita vendor APIs. Connections are pooled and kept alive across calls, 5xx and
+# connection errors are retried with exponential backoff, and every request gets a
+# per-host timeout unless the caller passes one. Each host is throttled by a token bucket
+# and an adaptive concurrency limit that halves on HTTP 429 (waiting out Retry-After)
+# and grows back by one slot per limit's worth of successful requests.
+
+
+# ____________________________________________________________________________________
+
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Default session settings, change with configure()
+settings = {
+    # Connections kept alive per host
+    "pool_size": 32,
+    # Retries on connection errors and 5xx responses
+    "retries": 3,
+    # Sleep between retries: backoff_factor * 2 ** (retry - 1) seconds
+    "backoff_factor": 0.5,
+    # (connect, read) timeout in seconds for hosts not in host_timeouts
+    "timeout": (5, 30),
+    # hostname -> (connect, read) timeout
+    "host_timeouts": {},
+    # Requests per second per host (None for no limit), burst is the bucket size
+    "rate_limit": 50,
+    "burst": 50,
+    # hostname -> requests per second
+    "host_rate_limits": {},
+    # Concurrent requests per host: starting limit and the range it adapts within
+    "initial_concurrency": 8,
+    "min_concurrency": 1,
+    "max_concurrency": 32,
+    # Times a 429 response is retried after waiting out Retry-After
+    "throttle_retries": 5,
+}
+
+
+# Class Name: TokenBucket
+# Parameters: rate (tokens per second, None for no limit), burst (bucket size)
+# Purpose: Block callers so requests to one host stay under rate per second on average
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Function Name: acquire
+    # Purpose: Take one token, sleeping until one is available
+    # Return: None
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Class Name: AdaptiveLimiter
+# Parameters: initial, minimum, maximum (concurrent requests)
+# Purpose: AIMD concurrency limit for one host. throttled() halves the limit and pauses
+# new requests, success() adds 1 / limit so the limit grows by one per full window
+class AdaptiveLimiter:
+    def __init__(self, initial, minimum, maximum):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.active = 0
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+
+    # Function Name: acquire
+    # Purpose: Wait for a free slot and for any Retry-After pause to pass
+    # Return: None
+    def acquire(self):
+        with self.condition:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                elif self.active >= int(self.limit):
+                    self.condition.wait()
+                else:
+                    self.active += 1
+                    return
+
+    # Function Name: release
+    # Purpose: Free a slot
+    # Return: None
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    # Function Name: success
+    # Purpose: Additive increase after a request that was not throttled
+    # Return: None
+    def success(self):
+        with self.condition:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    # Function Name: throttled
+    # Parameters: retry_after (seconds to pause the host)
+    # Purpose: Multiplicative decrease and pause after a 429
+    # Return: None
+    def throttled(self, retry_after):
+        with self.condition:
+            self.limit = max(self.minimum, self.limit / 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+
+# Function Name: retry_after_seconds
+# Parameters: response, default (seconds when the header is missing or invalid)
+# Purpose: Parse a Retry-After header given in seconds or as an HTTP date
+# Return: seconds to wait
+def retry_after_seconds(response, default):
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+# Class Name: VendorSession
+# Parameters: pool_size, retries, backoff_factor, timeout, host_timeouts, rate_limit,
+# burst, host_rate_limits, initial_concurrency, min_concurrency, max_concurrency,
+# throttle_retries
+# Purpose: requests.Session with a pooled retrying adapter, per-host timeouts and per-host
+# rate and concurrency limits that back off on 429
+class VendorSession(requests.Session):
+    def __init__(
+        self,
+        pool_size,
+        retries,
+        backoff_factor,
+        timeout,
+        host_timeouts,
+        rate_limit=None,
+        burst=1,
+        host_rate_limits=None,
+        initial_concurrency=None,
+        min_concurrency=1,
+        max_concurrency=None,
+        throttle_retries=0,
+    ):
+        super().__init__()
+        self.timeout = timeout
+        self.host_timeouts = dict(host_timeouts)
+        self.backoff_factor = backoff_factor
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.host_rate_limits = dict(host_rate_limits or {})
+        self.max_concurrency = max_concurrency or pool_size
+        self.initial_concurrency = initial_concurrency or self.max_concurrency
+        self.min_concurrency = min_concurrency
+        self.throttle_retries = throttle_retries
+        # hostname -> (TokenBucket, AdaptiveLimiter)
+        self.throttles = {}
+        self.throttles_lock = threading.Lock()
+
+        # Vendor calls are reads or idempotent "set level" writes, so POST is retried too
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD", "POST", "PUT", "DELETE"]),
+            raise_on_status=False,
+            # 429 and Retry-After are handled by the host throttle in request()
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    # Function Name: throttle
+    # Purpose: Token bucket and concurrency limiter for a host, created on first use
+    # Return: TokenBucket, AdaptiveLimiter
+    def throttle(self, host):
+        with self.throttles_lock:
+            if host not in self.throttles:
+                self.throttles[host] = (
+                    TokenBucket(
+                        self.host_rate_limits.get(host, self.rate_limit), self.burst
+                    ),
+                    AdaptiveLimiter(
+                        self.initial_concurrency,
+                        self.min_concurrency,
+                        self.max_concurrency,
+                    ),
+                )
+            return self.throttles[host]
+
+    # Function Name: request
+    # Purpose: Apply the host's timeout when the caller did not pass one, wait for the
+    # host's rate and concurrency limits, and retry 429 responses after Retry-After
+    # Return: requests.Response (the last 429 once throttle_retries are used up)
+    def request(self, method, url, **kwargs):
+        host = urlparse(url).hostname
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.host_timeouts.get(host, self.timeout)
+        bucket, limiter = self.throttle(host)
+
+        for attempt in range(self.throttle_retries + 1):
+            bucket.acquire()
+            limiter.acquire()
+            try:
+                response = super().request(method, url, **kwargs)
+                # Record the outcome before release wakes waiting threads, so they see
+                # the halved limit and Retry-After pause of a 429
+                if response.status_code == 429:
+                    limiter.throttled(
+                        retry_after_seconds(response, self.backoff_factor * 2**attempt)
+                    )
+                else:
+                    limiter.success()
+            finally:
+                limiter.release()
+            if response.status_code != 429:
+                return response
+            if attempt < self.throttle_retries:
+                response.close()
+        return response
+
+
+# Shared session created on first use
+_session = None
+_session_lock = threading.Lock()
+
+
+# Function Name: get_session
+# Parameters: None
+# Purpose: Lazily create the shared VendorSession from settings
+# Return: VendorSession
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = VendorSession(**settings)
+    return _session
+
+
+# Function Name: configure
+# Parameters: any key of settings (omitted keys keep the current value)
+# Purpose: Update the session settings, the shared session is rebuilt on next use
+# Return: None
+def configure(**updates):
+    global _session
+    unknown = set(updates) - set(settings)
+    if unknown:
+        raise ValueError(f"Unknown session settings: {sorted(unknown)}")
+    with _session_lock:
+        settings.update(updates)
+        if _session is not None:
+            _session.close()
+        _session = None
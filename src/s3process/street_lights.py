@@ -12,31 +12,162 @@
 # ____________________________________________________________________________________
 
 
-import requests
+import json
+import math
 import os
+import threading
+import time
+import requests
+from s3process.sessions import get_session
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+# Street light API
+API_ENDPOINT = "https://ats-api.smartlinx.tech/api/v2/"
+
+# LightPoints requested per devices page
+DEFAULT_PAGE_SIZE = 500
+
+# Seconds an enriched LightPoint stays valid in the inventory
+DEFAULT_INVENTORY_TTL = 15 * 60
+
+
+# Class Name: LightInventory
+# Parameters: ttl_seconds, path (JSON file to persist entries, None for memory only)
+# Purpose: TTL cache of enriched LightPoints keyed by id, in listing order. Lights
+# without a dimming level are cached too (as None) so they are not re-queried
+class LightInventory:
+    def __init__(self, ttl_seconds=DEFAULT_INVENTORY_TTL, path=None):
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                self.entries = {
+                    id: (fields, fetched) for id, fields, fetched in json.load(f)
+                }
+
+    # Function Name: is_fresh
+    # Purpose: Check if an id was enriched within max_age seconds (default ttl_seconds)
+    # Return: bool
+    def is_fresh(self, id, max_age=None):
+        entry = self.entries.get(id)
+        if max_age is None:
+            max_age = self.ttl_seconds
+        return entry is not None and time.time() - entry[1] <= max_age
+
+    # Function Name: get
+    # Purpose: Enriched fields of an id enriched within max_age (default ttl_seconds)
+    # Return: dict, or None if missing, expired or without a dimming level
+    def get(self, id, max_age=None):
+        return self.entries[id][0] if self.is_fresh(id, max_age) else None
+
+    # Function Name: set
+    # Purpose: Store the enriched fields (or None) of an id
+    # Return: None
+    def set(self, id, fields):
+        with self.lock:
+            self.entries.pop(id, None)
+            self.entries[id] = (fields, time.time())
+
+    # Function Name: first_functioning
+    # Purpose: First fresh LightPoint with a dimming level
+    # Return: dict, or None
+    def first_functioning(self):
+        for id in list(self.entries):
+            fields = self.get(id)
+            if fields is not None:
+                return fields
+        return None
+
+    # Function Name: functioning
+    # Purpose: Every fresh LightPoint with a dimming level, in listing order
+    # Return: list of dicts
+    def functioning(self):
+        return [
+            fields for fields in map(self.get, list(self.entries)) if fields is not None
+        ]
+
+    # Function Name: retain
+    # Purpose: Drop ids that are no longer listed by the API and order the rest as listed
+    # Return: None
+    def retain(self, ids):
+        with self.lock:
+            self.entries = {id: self.entries[id] for id in ids if id in self.entries}
+
+    # Function Name: save
+    # Purpose: Write the entries to path, if set
+    # Return: None
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            rows = [
+                [id, fields, fetched] for id, (fields, fetched) in self.entries.items()
+            ]
+        # Write to a temp file first so readers never see a partial inventory
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(rows, f)
+        os.replace(self.path + ".tmp", self.path)
+
+
+# Shared inventory created on first use
+_inventory = None
+
+
+# Function Name: get_default_inventory
+# Parameters: None
+# Purpose: Lazily create the module level inventory used by retrieve_one_functioning_light
+# Return: LightInventory
+def get_default_inventory():
+    global _inventory
+    if _inventory is None:
+        _inventory = LightInventory()
+    return _inventory
+
+
+# Function Name: light_point_request
+# Parameters: page_size
+# Purpose: Auth headers, routes and devices filter for listing commissioned LightPoints
+# Return: headers, get_devices, get_street_light, devices filter params
+def light_point_request(page_size=DEFAULT_PAGE_SIZE):
+    headers = {"Authorization": "Bearer " + os.environ["SMART_TOKEN"]}
+    params = {
+        "devicetype": ["LightPoint"],
+        "pagesize": page_size,
+        "cursorttl": 90,
+        "query": "core.unmanaged is false",
+    }
+    return headers, API_ENDPOINT + "devices", API_ENDPOINT + "streetlight", params
 
 
 # Function Name: retrieve_one_functioning_light
-# Parameters: None
-# Purpose: Retrieve one functioning light id
+# Parameters: inventory (LightInventory, default shared inventory), page_size
+# Purpose: Retrieve one functioning light id, from the inventory when it holds a fresh
+# one, else by walking the devices pages until the first light with a dimming level
 # Return: id of one functioning light
-def retrieve_one_functioning_light():
-    # Run API call and return the one functioning light
-    outdata_list = run_request_with_params()
-    return outdata_list[0]["id"]
+def retrieve_one_functioning_light(inventory=None, page_size=DEFAULT_PAGE_SIZE):
+    inventory = inventory or get_default_inventory()
+    id_fields = inventory.first_functioning()
+    if id_fields is None:
+        id_fields = find_functioning_light(inventory, *light_point_request(page_size))
+    if id_fields is None:
+        raise ValueError("No functioning LightPoint found")
+    return id_fields["id"]
 
 
 # Function Name: post_dimming_level
-# Parameters: id, dim, duration
+# Parameters: id, dim, duration, bearer_token (default SMART_TOKEN from env), verbose
 # Purpose: Using a light id, a supplied dim level and duration: makes a POST request
 # to edit the Dim level of the supplied id
 # Return: API response object
-def post_dimming_level(id, dim, duration):
+def post_dimming_level(id, dim, duration, bearer_token=None, verbose=True):
     # Street light API
-    api_endpoint = "https://ats-api.smartlinx.tech/api/v2/"
+    api_endpoint = API_ENDPOINT
 
     # Retrieve token from env
-    bearer_token = os.environ["SMART_TOKEN"]
+    bearer_token = bearer_token or os.environ["SMART_TOKEN"]
 
     # Street Light POST to DIM Route
     # /api/v2/streetlight/{id}/dimminglevel
@@ -49,10 +180,11 @@ def post_dimming_level(id, dim, duration):
 
     # Construct POST API payload that includes desired dim and duration
     dim_level_payload = {"level": int(dim), "duration": int(duration)}
-    print(dim_level_payload)
+    if verbose:
+        print(dim_level_payload)
 
     # Send post request to API
-    response = requests.post(
+    response = get_session().post(
         post_dim_using_id, params=dim_level_payload, headers=headers
     )
 
@@ -60,123 +192,438 @@ def post_dimming_level(id, dim, duration):
     return response
 
 
+# Function Name: dispatch_dimming_level
+# Parameters: id, dim, duration, bearer_token
+# Purpose: POST one dim level and time it, capturing failures instead of raising
+# Return: dict of id, dim, duration, ok, status, latency_seconds and error
+def dispatch_dimming_level(id, dim, duration, bearer_token):
+    result = {"id": id, "dim": dim, "duration": duration, "status": None, "error": None}
+    start = time.perf_counter()
+    try:
+        response = post_dimming_level(id, dim, duration, bearer_token, verbose=False)
+        result["status"] = response.status_code
+        if not response.ok:
+            result["error"] = response.text[:200]
+    except Exception as e:
+        result["error"] = str(e)
+    result["latency_seconds"] = time.perf_counter() - start
+    result["ok"] = result["error"] is None
+    return result
+
+
+# Function Name: percentile
+# Parameters: ordered (sorted list of numbers), fraction (0 to 1)
+# Purpose: Nearest-rank percentile of a sorted list
+# Return: value, or None for an empty list
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+# Function Name: post_dimming_levels
+# Parameters: plan (iterable of (id, dim, duration)), max_workers, bearer_token (default
+# SMART_TOKEN from env)
+# Purpose: POST a dim level to many lights with bounded concurrency over the shared
+# session, reading the token once
+# Return: dict with "results" (per light dicts in plan order) and "stats" (counts, wall
+# time and latency mean/p50/p95/max in seconds)
+def post_dimming_levels(plan, max_workers=16, bearer_token=None):
+    bearer_token = bearer_token or os.environ["SMART_TOKEN"]
+    plan = list(plan)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(
+            executor.map(
+                lambda item: dispatch_dimming_level(*item, bearer_token=bearer_token),
+                plan,
+            )
+        )
+    wall_seconds = time.perf_counter() - start
+
+    latencies = sorted(result["latency_seconds"] for result in results)
+    succeeded = sum(result["ok"] for result in results)
+    stats = {
+        "count": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "wall_seconds": wall_seconds,
+        "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_max": latencies[-1] if latencies else None,
+    }
+    return {"results": results, "stats": stats}
+
+
+# Function Name: plan_from_results
+# Parameters: results_df (results.process_results output), duration
+# Purpose: Dimming plan of EvariNum -> DIM from a results.csv frame
+# Return: list of (id, dim, duration)
+def plan_from_results(results_df, duration):
+    return [
+        (str(id), int(dim), int(duration))
+        for id, dim in zip(results_df["EvariNum"], results_df["DIM"])
+    ]
+
+
+# Function Name: reconcile_dimming_plan
+# Parameters: plan (iterable of (id, dim, duration)), current_levels (dict of id ->
+# current dimmingLevel)
+# Purpose: Drop plan entries whose light is already at the target level. Lights with no
+# known level are kept
+# Return: list of (id, dim, duration) to send, number of entries skipped
+def reconcile_dimming_plan(plan, current_levels):
+    changes = []
+    skipped = 0
+    for id, dim, duration in plan:
+        current = current_levels.get(id)
+        if current is not None and int(current) == int(dim):
+            skipped += 1
+        else:
+            changes.append((id, dim, duration))
+    return changes, skipped
+
+
+# Function Name: read_dimming_level
+# Parameters: id, headers, get_street_light
+# Purpose: GET the current dim level of one light
+# Return: level, or None if the light reports no dim level ({} or [])
+# Raises requests.HTTPError when the request fails
+def read_dimming_level(id, headers, get_street_light):
+    response = get_session().get(
+        get_street_light + "/" + id + "/dimminglevel", headers=headers
+    )
+    response.raise_for_status()
+    dim_level = response.json()
+    # Same emptiness check as enrich_record
+    if len(dim_level) > 0:
+        return dim_level["value"]
+    return None
+
+
+# Function Name: read_dimming_levels
+# Parameters: ids, max_workers, bearer_token (default SMART_TOKEN from env), inventory,
+# max_age (seconds an inventory dimmingLevel may be reused, 0 re-reads every id)
+# Purpose: Current dim levels of the given lights, read concurrently from the API
+# Return: dict of id -> level, lights without a level or whose read failed are omitted
+def read_dimming_levels(
+    ids, max_workers=16, bearer_token=None, inventory=None, max_age=0
+):
+    headers = {"Authorization": "Bearer " + (bearer_token or os.environ["SMART_TOKEN"])}
+    get_street_light = API_ENDPOINT + "streetlight"
+
+    levels = {}
+    stale = []
+    for id in dict.fromkeys(ids):
+        id_fields = inventory.get(id, max_age) if inventory and max_age else None
+        if id_fields is not None:
+            levels[id] = id_fields["dimmingLevel"]
+        else:
+            stale.append(id)
+
+    def read(id):
+        try:
+            return read_dimming_level(id, headers, get_street_light)
+        except (requests.RequestException, ValueError, LookupError, TypeError) as e:
+            # A failed or malformed read leaves the level unknown, so the light is sent
+            print(f"Failed to read dim level of LightPoint {id}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers or 1) as executor:
+        for id, level in zip(stale, executor.map(read, stale)):
+            if level is not None:
+                levels[id] = level
+    return levels
+
+
+# Function Name: post_dimming_changes
+# Parameters: plan (iterable of (id, dim, duration)), current_levels (dict of id ->
+# dimmingLevel, default read_dimming_levels for the planned ids), max_workers,
+# bearer_token, inventory, max_age (seconds an inventory dimmingLevel may be trusted
+# instead of re-reading it, default 0)
+# Purpose: Reconcile mode of post_dimming_levels, only POST lights whose level differs
+# from the plan. Levels are re-read by default, since writes made outside this process
+# (the scheduled Lambda, manual changes) never reach the inventory
+# Return: post_dimming_levels report, with "planned" and "skipped" added to stats
+def post_dimming_changes(
+    plan,
+    current_levels=None,
+    max_workers=16,
+    bearer_token=None,
+    inventory=None,
+    max_age=0,
+):
+    plan = list(plan)
+    if current_levels is None:
+        if max_age:
+            inventory = inventory or get_default_inventory()
+        current_levels = read_dimming_levels(
+            [id for id, _, _ in plan], max_workers, bearer_token, inventory, max_age
+        )
+    changes, skipped = reconcile_dimming_plan(plan, current_levels)
+
+    report = post_dimming_levels(changes, max_workers, bearer_token)
+    report["stats"]["planned"] = len(plan)
+    report["stats"]["skipped"] = skipped
+
+    # Keep the inventory in step with the levels just written
+    if inventory is not None:
+        for result in report["results"]:
+            id_fields = inventory.get(result["id"])
+            if result["ok"] and id_fields is not None:
+                inventory.set(
+                    result["id"], {**id_fields, "dimmingLevel": result["dim"]}
+                )
+        inventory.save()
+    return report
+
+
+# Function Name: enrich_record
+# Parameters: record, headers, get_devices, get_street_light
+# Purpose: helper request function to retrieve dimming level, and associated information
+# from LightPoints /id endpoint for one LightPoint
+# Return: dict of name, coords, metering and dimmingLevel, or None without a dim level
+# Raises requests.HTTPError when either request fails (e.g. still 429 after retries)
+def enrich_record(record, headers, get_devices, get_street_light):
+    # Retrieve Dim level Attribute
+    get_street_light_id_dim = get_street_light + "/" + record["id"] + "/dimminglevel"
+    response = get_session().get(get_street_light_id_dim, headers=headers)
+    response.raise_for_status()
+    dim_level = response.json()
+    if len(dim_level) > 0:
+        # Dim level added to list
+        dim_display = dim_level["value"]
+
+        # Request other attribute information
+        get_device_id = get_devices + "/" + record["id"]
+
+        # Return id, name, coords, metering
+        query_field_payload = {"field[]": ["name", "coords", "metering"]}
+        response = get_session().get(
+            get_device_id, params=query_field_payload, headers=headers
+        )
+        response.raise_for_status()
+        id_fields = response.json()
+        id_fields["dimmingLevel"] = dim_display
+        return id_fields
+    return None
+
+
+# Function Name: try_enrich_record
+# Parameters: record, headers, get_devices, get_street_light
+# Purpose: enrich_record that prints a failed request instead of raising, so one light
+# does not stop a crawl
+# Return: True and the enrich_record result, or False and None on failure
+def try_enrich_record(record, headers, get_devices, get_street_light):
+    try:
+        return True, enrich_record(record, headers, get_devices, get_street_light)
+    except requests.RequestException as e:
+        print(f"Failed to enrich LightPoint {record['id']}: {e}")
+        return False, None
+
+
+# Function Name: enrich_page
+# Parameters: data, headers, get_devices, get_street_light, max_workers (enrich up to this
+# many LightPoints concurrently, None for sequential)
+# Purpose: Enrich one page of LightPoints, keeping page order
+# Return: list of data for the page's lights that have a dim level
+def enrich_page(data, headers, get_devices, get_street_light, max_workers=None):
+    # Fan the per-device requests out over a bounded thread pool, map keeps page order
+    if max_workers and max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            enriched = list(
+                executor.map(
+                    lambda record: try_enrich_record(
+                        record, headers, get_devices, get_street_light
+                    ),
+                    data,
+                )
+            )
+    else:
+        enriched = (
+            try_enrich_record(record, headers, get_devices, get_street_light)
+            for record in data
+        )
+
+    # Skip failed lights and lights without a dim level
+    return [id_fields for ok, id_fields in enriched if ok and id_fields is not None]
+
+
 # Function Name: save_data
-# Parameters: data, headers, get_devices, get_street_light, outdata_full_list
+# Parameters: data, headers, get_devices, get_street_light, outdata_full_list,
+# max_workers (enrich up to this many LightPoints concurrently, None for sequential)
 # Purpose: helper request function to retrieve dimming level, and associated information
 # from LightPoints /id endpoint
 # Gathers data of dimminglevel, id, name, coords, and meterings
 # Return: List of data for all returned lights
-def save_data(data, headers, get_devices, get_street_light, outdata_full_list):
-    # Beginning loop iteration of LightPoint ids
-    for record in data:
-        # Retrieve Dim level Attribute
-        get_street_light_id_dim = (
-            get_street_light + "/" + record["id"] + "/dimminglevel"
-        )
-        dim_level = requests.get(get_street_light_id_dim, headers=headers).json()
-        if len(dim_level) > 0:
-            # Dim level added to list
-            dim_display = dim_level["value"]
-
-            # Request other attribute information
-            get_device_id = get_devices + "/" + record["id"]
+def save_data(
+    data, headers, get_devices, get_street_light, outdata_full_list, max_workers=None
+):
+    # Write data to out array
+    outdata_full_list.extend(
+        enrich_page(data, headers, get_devices, get_street_light, max_workers)
+    )
 
-            # Return id, name, coords, metering
-            query_field_payload = {"field[]": ["name", "coords", "metering"]}
-            id_fields = requests.get(
-                get_device_id, params=query_field_payload, headers=headers
-            ).json()
-            id_fields["dimmingLevel"] = dim_display
 
-            # Write data to out array
-            outdata_full_list.append(id_fields)
+# Function Name: fetch_page
+# Parameters: url, params, headers
+# Purpose: GET one page of devices and resolve the rel="next" cursor from its Link header
+# Return: page data, absolute url of the next page (None on the last page)
+# Raises requests.HTTPError when the page request fails
+def fetch_page(url, params, headers):
+    response = get_session().get(url, params=params, headers=headers)
+    response.raise_for_status()
+    next_link = response.links.get("next", {}).get("url")
+    # Link urls may be relative to the page they came from
+    next_url = urljoin(response.url, next_link) if next_link else None
+    return response.json(), next_url
+
+
+# Function Name: find_functioning_light
+# Parameters: inventory, headers, get_devices, get_street_light, params
+# Purpose: Walk the devices pages, enriching ids that are not fresh in the inventory one
+# at a time, and stop at the first light with a dimming level
+# Return: dict of the first functioning light, or None
+def find_functioning_light(inventory, headers, get_devices, get_street_light, params):
+    url = get_devices
+    while url:
+        data, url = fetch_page(url, params, headers)
+        params = None
+        for record in data:
+            if inventory.is_fresh(record["id"]):
+                id_fields = inventory.get(record["id"])
+            else:
+                ok, id_fields = try_enrich_record(
+                    record, headers, get_devices, get_street_light
+                )
+                # Failed lights are retried on the next lookup, not cached
+                if ok:
+                    inventory.set(record["id"], id_fields)
+            if id_fields is not None:
+                inventory.save()
+                return id_fields
+    inventory.save()
+    return None
+
+
+# Function Name: refresh_inventory
+# Parameters: inventory, max_workers (concurrent enrichment, None for sequential),
+# page_size
+# Purpose: List every LightPoint id and enrich only the ids that are new or expired in the
+# inventory, dropping ids the API no longer lists
+# Return: list of functioning LightPoint data, in listing order
+def refresh_inventory(inventory=None, max_workers=None, page_size=DEFAULT_PAGE_SIZE):
+    inventory = inventory or get_default_inventory()
+    headers, get_devices, get_street_light, params = light_point_request(page_size)
+
+    # Listing ids is one request per page, enrichment is two per light
+    ids = [
+        record["id"]
+        for data in iter_pages(get_devices, params, headers)
+        for record in data
+    ]
+
+    stale = [{"id": id} for id in ids if not inventory.is_fresh(id)]
+    with ThreadPoolExecutor(max_workers=max_workers or 1) as executor:
+        enriched = executor.map(
+            lambda record: try_enrich_record(
+                record, headers, get_devices, get_street_light
+            ),
+            stale,
+        )
+        for record, (ok, id_fields) in zip(stale, enriched):
+            if ok:
+                inventory.set(record["id"], id_fields)
+
+    inventory.retain(ids)
+    inventory.save()
+    return inventory.functioning()
+
+
+# Function Name: iter_pages
+# Parameters: url, params, headers
+# Purpose: Follow the Link header cursor from url, fetching page N+1 in the background
+# while the caller works on page N
+# Return: generator of page data
+def iter_pages(url, params, headers):
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        # The first page carries the filter params, cursor urls already include them
+        data, url = fetch_page(url, params, headers)
+        while True:
+            next_page = prefetch.submit(fetch_page, url, None, headers) if url else None
+            yield data
+            # Stop when there is no next page
+            if next_page is None:
+                return
+            data, url = next_page.result()
+
+
+# Function Name: iter_paged_api
+# Parameters: url, params, headers, get_devices, get_street_light, max_workers (passed
+# to enrich_page)
+# Purpose: Enrich the LightPoints of every page as it arrives
+# Return: generator of LightPoint data, one page held in memory at a time
+def iter_paged_api(
+    url, params, headers, get_devices, get_street_light, max_workers=None
+):
+    for data in iter_pages(url, params, headers):
+        yield from enrich_page(
+            data, headers, get_devices, get_street_light, max_workers
+        )
 
 
 # Function Name: parse_paged_api
-# Parameters: url, params, headers, get_devices, get_street_light, outdata_full_list
+# Parameters: url, params, headers, get_devices, get_street_light, outdata_full_list,
+# max_workers (passed to enrich_page)
 # Purpose: Core request function to iterate over pages in the request to get all data
-# Calls save_data in order to write data to out array for additional requested fields
-# Return: iterates API pages, and save_data writes out_data until there are no pages
+# Return: iterates API pages, and writes out_data until there are no pages
 def parse_paged_api(
-    url, params, headers, get_devices, get_street_light, outdata_full_list
+    url,
+    params,
+    headers,
+    get_devices,
+    get_street_light,
+    outdata_full_list,
+    max_workers=None,
 ):
-    while url:
-        response = requests.get(get_devices, params=params, headers=headers)
-        data = response.json()
-        # Process the data from the current page
-        save_data(data, headers, get_devices, get_street_light, outdata_full_list)
-        # Check if there is a next page
-        if "Link" in response.headers and 'rel="next"' in response.headers["Link"]:
-            next_page_url = response.headers["Link"].split(";")[0].strip("<>")
-            url = next_page_url
-        else:
-            url = None
-
-
-# Function Name: run_request_with_params
-# Parameters: None
-# Purpose: Run basic street-light run, to return data of commissioned light
-# Return: LightPoint data which includes name, id, coords, metering, dimminglevel
-def run_request_with_params():
-    # API endpoint
-    api_endpoint = "https://ats-api.smartlinx.tech/api/v2/"
-
-    # Token initialization
-    bearer_token = os.environ["SMART_TOKEN"]
-
-    # Street Light Core Routes
-    devices_route = "devices"
-    device_types_route = "devicetypes"
-    street_light_route = "streetlight"
-
-    # Street Light API Route Endpoints
-    get_devices = api_endpoint + devices_route
-    get_device_types = api_endpoint + device_types_route
-    get_street_light = api_endpoint + street_light_route
+    outdata_full_list.extend(
+        iter_paged_api(url, params, headers, get_devices, get_street_light, max_workers)
+    )
 
-    # Initializing Variables
-    outdata_full_list = []
 
-    # Initialize Bearer Token Api Access Token Header for all API Requests
-    token_header = "Bearer " + bearer_token
-    headers = {"Authorization": token_header}
+# Function Name: iter_light_points
+# Parameters: max_workers (concurrent per-device enrichment, None for sequential),
+# page_size (LightPoints per devices page)
+# Purpose: Stream commissioned LightPoints, yielding each page's lights once enriched
+# Return: generator of LightPoint data which includes name, id, coords, metering,
+# dimminglevel
+def iter_light_points(max_workers=None, page_size=DEFAULT_PAGE_SIZE):
+    # Auth header, routes and LightPoint filter for all API Requests
+    headers, get_devices, get_street_light, devicetype_filter_payload = (
+        light_point_request(page_size)
+    )
+    get_device_types = API_ENDPOINT + "devicetypes"
 
     # Request to devicetypes to ensure LightPoint Device exists for subsequent processing
-    device_type_light_point = ""
-    device_types = requests.get(get_device_types, headers=headers).json()
-    for device in device_types:
-        # If LightPoint is found, set LightPointDevice and continue processing
-        if device == "LightPoint":
-
-            # Set light point logic and regular variables to proceed processing
-            device_type_light_point = device
-
-            # Run Filter on LightPoints to retrieve LightPoint ids if LightPoint objects exist
-            devicetype_filter_payload_list = [device_type_light_point]
-            devicetype_filter_payload = {
-                "devicetype": devicetype_filter_payload_list,
-                "pagesize": 10,
-                "cursorttl": 90,
-                "query": "core.unmanaged is false",
-            }
-            # ids_filtered_light_point = requests.get(get_devices, params=devicetype_filter_payload, headers=headers).json()
-
-            # Call to helper function to pare API by pages for all data
-            parse_paged_api(
-                get_devices,
-                devicetype_filter_payload,
-                headers,
-                get_devices,
-                get_street_light,
-                outdata_full_list,
-            )
-
-            # Break Loop to save memory -> Only care about LightPoint object
-            break
+    response = get_session().get(get_device_types, headers=headers)
+    response.raise_for_status()
+    if "LightPoint" in response.json():
+        yield from iter_paged_api(
+            get_devices,
+            devicetype_filter_payload,
+            headers,
+            get_devices,
+            get_street_light,
+            max_workers,
+        )
 
-        else:
-            # Run to next iteration if LightPoint is not found
-            continue
 
-    # Return the data
-    return outdata_full_list
+# Function Name: run_request_with_params
+# Parameters: max_workers (concurrent per-device enrichment, None for sequential),
+# page_size (LightPoints per devices page)
+# Purpose: Run basic street-light run, to return data of commissioned light
+# Return: LightPoint data which includes name, id, coords, metering, dimminglevel
+def run_request_with_params(max_workers=None, page_size=DEFAULT_PAGE_SIZE):
+    return list(iter_light_points(max_workers, page_size))
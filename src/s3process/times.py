@@ -1,26 +1,62 @@
 import pytz
 from timezonefinder import TimezoneFinder
 from datetime import datetime, timedelta
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pysolar.solar import get_altitude
 import math
+import os
 import time
 import warnings
-
-# TODO import GDAL and make sure elevation calculation works.
+import numpy as np
+import pandas as pd
+from s3process.twilight import calculate_sun_time
 
 # Suppress specific warning about leap seconds
 warnings.filterwarnings("ignore", message="I don't know about leap seconds after 2023")
 
+# Class to sample DEM elevations, keeps datasets open and caches elevations per location
+class DemSampler:
+    def __init__(self):
+        self.datasets = {}
+        self.elevations = {}
+
+    # Open a DEM once and keep its dataset, geotransform and band for later samples
+    # GDAL is imported here so only DEM users need its native libraries
+    def open(self, dem_path):
+        if dem_path not in self.datasets:
+            from osgeo import gdal
+
+            dem = gdal.Open(dem_path)
+            if dem is None:
+                raise ValueError("DEM could not be opened: " + dem_path)
+            self.datasets[dem_path] = (dem, dem.GetGeoTransform(), dem.GetRasterBand(1))
+        return self.datasets[dem_path]
+
+    # Read only the pixel window under lat/lon, cached per (dem_path, lat, lon)
+    def sample(self, dem_path, lat, lon):
+        key = (dem_path, lat, lon)
+        if key not in self.elevations:
+            dem, transform, band = self.open(dem_path)
+            x = int((lon - transform[0]) / transform[1])
+            y = int((lat - transform[3]) / transform[5])
+            if not (0 <= x < dem.RasterXSize and 0 <= y < dem.RasterYSize):
+                raise ValueError("Location is outside of the DEM extent.")
+            self.elevations[key] = band.ReadAsArray(x, y, 1, 1)[0, 0]
+        return self.elevations[key]
+
+    # Drop cached elevations and close every open dataset
+    def close(self):
+        self.elevations.clear()
+        self.datasets.clear()
+
+# Shared sampler so repeated lookups reuse open datasets
+dem_sampler = DemSampler()
+
 # Function to extract elevation from a DEM using lat/lon
 def get_elevation_from_dem(dem_path, lat, lon):
-    dem = gdal.Open(dem_path)
-    transform = dem.GetGeoTransform()
-    x = int((lon - transform[0]) / transform[1])
-    y = int((lat - transform[3]) / transform[5])
-    band = dem.GetRasterBand(1)
-    elevation_array = band.ReadAsArray()
-    elevation = elevation_array[y, x]
-    return elevation
+    return dem_sampler.sample(dem_path, lat, lon)
 
 # Function to apply altitude correction for ground elevation
 def altitude_correction(altitude, elevation):
@@ -42,8 +78,43 @@ def find_boundary_time(lat, lon, initial_time, direction, step_minutes=60):
             return current_time
         current_time += timedelta(minutes=step_minutes)
 
+# Function to get the (optionally elevation corrected) altitude minus the twilight threshold
+def twilight_residual(lat, lon, time, twilight_altitude, elevation=0):
+    altitude = calculate_altitude(lat, lon, time)
+    if elevation:
+        altitude = altitude_correction(altitude, elevation)
+    return altitude - twilight_altitude
+
+# Function to bisect the twilight crossing between low and high to tolerance_seconds
+def bisect_twilight(lat, lon, low, high, direction, twilight_altitude, elevation=0, tolerance_seconds=1):
+    # Dawn crosses the threshold going up, dusk going down -> sign of the residual at the bounds
+    sign = 1 if direction == 'dawn' else -1
+    if sign * twilight_residual(lat, lon, low, twilight_altitude, elevation) > 0:
+        return None
+    if sign * twilight_residual(lat, lon, high, twilight_altitude, elevation) <= 0:
+        return None
+    while (high - low).total_seconds() > tolerance_seconds:
+        mid = low + (high - low) / 2
+        if sign * twilight_residual(lat, lon, mid, twilight_altitude, elevation) > 0:
+            high = mid
+        else:
+            low = mid
+    # Return the bound on the dark side of the threshold, matching the minute scan
+    return low if direction == 'dawn' else high
+
 # Function to refine the civil twilight times within a 2-hour window
-def refine_twilight(lat, lon, time, direction, twilight_altitude, dem_path, radius_minutes=120):
+def refine_twilight(lat, lon, time, direction, twilight_altitude, dem_path, radius_minutes=120, method='scan', tolerance_seconds=1):
+    # Ground elevation does not change inside the window, look it up once per location
+    elevation = get_elevation_from_dem(dem_path, lat, lon) if dem_path else 0
+
+    if method == 'bisect':
+        # Bracket seeded by the hourly boundary from find_boundary_time, falls back to scan if not bracketed
+        low = time - timedelta(minutes=radius_minutes)
+        high = time if direction == 'dawn' else time + timedelta(minutes=radius_minutes)
+        twilight_time = bisect_twilight(lat, lon, low, high, direction, twilight_altitude, elevation, tolerance_seconds)
+        if twilight_time is not None:
+            return twilight_time
+
     twilight_time = None
     if direction == 'dawn':
         # Search backward from the given time for the first occurrence of twilight_altitude
@@ -51,7 +122,6 @@ def refine_twilight(lat, lon, time, direction, twilight_altitude, dem_path, radi
             current_time = time - timedelta(minutes=minute)
             utc_time = current_time.astimezone(pytz.utc)
             altitude = calculate_altitude(lat, lon, current_time)
-            elevation = get_elevation_from_dem(dem_path, lat, lon) if dem_path else 0
             corrected_altitude = altitude_correction(altitude, elevation) if dem_path else altitude
 
             if corrected_altitude <= twilight_altitude:
@@ -63,7 +133,6 @@ def refine_twilight(lat, lon, time, direction, twilight_altitude, dem_path, radi
             current_time = time + timedelta(minutes=minute)
             utc_time = current_time.astimezone(pytz.utc)
             altitude = calculate_altitude(lat, lon, current_time)
-            elevation = get_elevation_from_dem(dem_path, lat, lon) if dem_path else 0
             corrected_altitude = altitude_correction(altitude, elevation) if dem_path else altitude
 
             if corrected_altitude <= twilight_altitude:
@@ -71,9 +140,54 @@ def refine_twilight(lat, lon, time, direction, twilight_altitude, dem_path, radi
                 break
     return twilight_time
 
+# Function to get the closed-form twilight estimate from twilight.py as a local datetime
+def analytic_twilight(lat, lon, date, tz, direction, twilight_altitude, elevation=0):
+    is_rising = direction == 'dawn'
+    estimate = calculate_sun_time(datetime(date.year, date.month, date.day), lat, lon, elevation, twilight_altitude, is_rising)
+    if estimate is None:
+        return None
+
+    return move_to_local_date(estimate, date, tz)
+
+# Function to move a naive UTC time of day on date (twilight.py convention) onto the local date
+def move_to_local_date(utc_time, date, tz):
+    local_time = pytz.utc.localize(utc_time).astimezone(tz)
+    if local_time.date() < datetime(date.year, date.month, date.day).date():
+        local_time += timedelta(days=1)
+    elif local_time.date() > datetime(date.year, date.month, date.day).date():
+        local_time -= timedelta(days=1)
+    return tz.normalize(local_time)
+
+# Function to refine an analytic seed with a few pysolar evaluations, widening the bracket if needed
+def refine_from_seed(lat, lon, seed, direction, twilight_altitude, elevation=0, tolerance_seconds=1):
+    for radius_minutes in (10, 30, 120):
+        low = seed - timedelta(minutes=radius_minutes)
+        high = seed + timedelta(minutes=radius_minutes)
+        twilight_time = bisect_twilight(lat, lon, low, high, direction, twilight_altitude, elevation, tolerance_seconds)
+        if twilight_time is not None:
+            return twilight_time
+    return None
+
 # Optimized function to find sunrise, sunset, and civil twilight
-def find_civil_twilight(lat, lon, date, timezone, dem_path=None, twilight_altitude=-6.0):
+def find_civil_twilight(lat, lon, date, timezone, dem_path=None, twilight_altitude=-6.0, method='scan', precision=None):
     tz = pytz.timezone(timezone)
+
+    # 'fast' returns the analytic estimate, 'precise' refines it with pysolar
+    if precision in ('fast', 'precise'):
+        elevation = get_elevation_from_dem(dem_path, lat, lon) if dem_path else 0
+        seed_dawn = analytic_twilight(lat, lon, date, tz, 'dawn', twilight_altitude, elevation)
+        seed_dusk = analytic_twilight(lat, lon, date, tz, 'dusk', twilight_altitude, elevation)
+        if precision == 'fast':
+            return seed_dawn, seed_dusk
+
+        civil_dawn = refine_from_seed(lat, lon, seed_dawn, 'dawn', twilight_altitude, elevation) if seed_dawn else None
+        civil_dusk = refine_from_seed(lat, lon, seed_dusk, 'dusk', twilight_altitude, elevation) if seed_dusk else None
+        # Fall back to the hourly scan below only when a seed could not be refined
+        if (seed_dawn is None or civil_dawn is not None) and (seed_dusk is None or civil_dusk is not None):
+            return civil_dawn, civil_dusk
+    elif precision is not None:
+        raise ValueError("precision must be None, 'fast' or 'precise'.")
+
     local_time = tz.localize(datetime(date.year, date.month, date.day, 0, 0, 0))
 
     sunrise = find_boundary_time(lat, lon, local_time, 'sunrise')
@@ -82,28 +196,221 @@ def find_civil_twilight(lat, lon, date, timezone, dem_path=None, twilight_altitu
     if sunrise is None or sunset is None:
         return None, None
 
-    civil_dawn = refine_twilight(lat, lon, sunrise, 'dawn', twilight_altitude, dem_path)
-    civil_dusk = refine_twilight(lat, lon, sunset, 'dusk', twilight_altitude, dem_path)
+    civil_dawn = refine_twilight(lat, lon, sunrise, 'dawn', twilight_altitude, dem_path, method=method)
+    civil_dusk = refine_twilight(lat, lon, sunset, 'dusk', twilight_altitude, dem_path, method=method)
 
     return civil_dawn, civil_dusk
 
+# Function to calculate solar altitude for arrays of lat/lon/UTC times (NOAA equations)
+def calculate_altitude_array(lat, lon, utc_times):
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    utc_times = np.asarray(utc_times, dtype="datetime64[ns]")
+
+    # Julian day and Julian century from the UTC timestamps
+    julian_day = utc_times.astype(np.int64) / 86400e9 + 2440587.5
+    jc = (julian_day - 2451545.0) / 36525.0
+
+    # Sun's geometric mean longitude/anomaly and Earth's orbit eccentricity
+    mean_long = np.mod(280.46646 + jc * (36000.76983 + jc * 0.0003032), 360)
+    mean_anom = np.radians(357.52911 + jc * (35999.05029 - 0.0001537 * jc))
+    eccentricity = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+
+    # Sun's equation of center, apparent longitude and the corrected obliquity
+    center = (
+        np.sin(mean_anom) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+        + np.sin(2 * mean_anom) * (0.019993 - 0.000101 * jc)
+        + np.sin(3 * mean_anom) * 0.000289
+    )
+    omega = np.radians(125.04 - 1934.136 * jc)
+    apparent_long = np.radians(mean_long + center - 0.00569 - 0.00478 * np.sin(omega))
+    mean_obliquity = 23 + (26 + (21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))) / 60) / 60
+    obliquity = np.radians(mean_obliquity + 0.00256 * np.cos(omega))
+
+    # Declination and equation of time (minutes)
+    declination = np.arcsin(np.sin(obliquity) * np.sin(apparent_long))
+    y = np.tan(obliquity / 2) ** 2
+    l0 = np.radians(mean_long)
+    equation_of_time = 4 * np.degrees(
+        y * np.sin(2 * l0)
+        - 2 * eccentricity * np.sin(mean_anom)
+        + 4 * eccentricity * y * np.sin(mean_anom) * np.cos(2 * l0)
+        - 0.5 * y * y * np.sin(4 * l0)
+        - 1.25 * eccentricity * eccentricity * np.sin(2 * mean_anom)
+    )
+
+    # True solar time -> hour angle -> altitude above the horizon
+    minutes_utc = (utc_times - utc_times.astype("datetime64[D]")) / np.timedelta64(1, "m")
+    true_solar_time = np.mod(minutes_utc + equation_of_time + 4 * lon, 1440)
+    hour_angle = np.radians(true_solar_time / 4 - 180)
+    lat_rad = np.radians(lat)
+    cos_zenith = np.sin(lat_rad) * np.sin(declination) + np.cos(lat_rad) * np.cos(declination) * np.cos(hour_angle)
+    return 90 - np.degrees(np.arccos(np.clip(cos_zenith, -1, 1)))
+
+# Function to bisect the crossing of twilight_altitude inside [low, high] for every item at once
+def bisect_crossing_array(lat, lon, low, high, twilight_altitude, rising, tolerance_seconds=1):
+    low = np.asarray(low, dtype="datetime64[ns]").astype(np.int64)
+    high = np.asarray(high, dtype="datetime64[ns]").astype(np.int64)
+    while np.any(high - low > tolerance_seconds * 1e9):
+        mid = low + (high - low) // 2
+        above = calculate_altitude_array(lat, lon, mid.astype("datetime64[ns]")) > twilight_altitude
+        # Rising: the crossing is before mid once the sun is above the threshold, setting is the opposite
+        before = above if rising else ~above
+        high = np.where(before, mid, high)
+        low = np.where(before, low, mid)
+    return high.astype("datetime64[ns]")
+
+# Vectorized civil twilight for arrays of lat/lon/date sharing one timezone
+def find_civil_twilight_batch(lats, lons, dates, timezone, twilight_altitude=-6.0, tolerance_seconds=1):
+    days = pd.to_datetime(np.ravel(dates)).values.astype("datetime64[D]").reshape(np.shape(dates))
+    lats, lons, dates = np.broadcast_arrays(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float), days)
+    lats, lons, dates = lats.ravel(), lons.ravel(), dates.ravel()
+
+    # Local midnight of every date, expressed in UTC
+    midnight = pd.DatetimeIndex(dates.astype("datetime64[ns]")).tz_localize(
+        timezone, ambiguous=np.zeros(len(dates), dtype=bool), nonexistent="shift_forward"
+    )
+    midnight = midnight.tz_convert("UTC").tz_localize(None).values
+
+    # Hourly altitude grid over the local day, shape (n, 25)
+    hours = np.arange(25) * np.timedelta64(1, "h")
+    grid = midnight[:, None] + hours[None, :]
+    altitude = calculate_altitude_array(lats[:, None], lons[:, None], grid)
+    above = altitude > twilight_altitude
+
+    # First hourly bracket where the sun rises through / sets through the threshold
+    rises = ~above[:, :-1] & above[:, 1:]
+    sets = above[:, :-1] & ~above[:, 1:]
+    has_dawn = rises.any(axis=1)
+    has_dusk = sets.any(axis=1)
+    rows = np.arange(len(dates))
+    dawn_idx = rises.argmax(axis=1)
+    dusk_idx = np.where(sets, np.arange(24)[None, :], -1).max(axis=1)
+
+    dawn = bisect_crossing_array(
+        lats, lons, grid[rows, dawn_idx], grid[rows, dawn_idx + 1], twilight_altitude, True, tolerance_seconds
+    )
+    dusk = bisect_crossing_array(
+        lats, lons, grid[rows, dusk_idx], grid[rows, dusk_idx + 1], twilight_altitude, False, tolerance_seconds
+    )
+
+    # Polar day/night has no crossing -> NaT
+    dawn = np.where(has_dawn, dawn, np.datetime64("NaT"))
+    dusk = np.where(has_dusk, dusk, np.datetime64("NaT"))
+    civil_dawn = pd.DatetimeIndex(dawn).round("s").tz_localize("UTC").tz_convert(timezone)
+    civil_dusk = pd.DatetimeIndex(dusk).round("s").tz_localize("UTC").tz_convert(timezone)
+    return civil_dawn, civil_dusk
+
+# Worker function: vectorized twilight for one chunk of EvariNum/lat/lon/date/timezone rows
+def compute_twilight_chunk(chunk, twilight_altitude=-6.0):
+    start = time.perf_counter()
+    frames = []
+    for timezone, group in chunk.groupby("timezone", sort=False):
+        civil_dawn, civil_dusk = find_civil_twilight_batch(
+            group["lat"].values, group["lon"].values, group["date"].values, timezone, twilight_altitude
+        )
+        frames.append(pd.DataFrame({
+            "EvariNum": group["EvariNum"],
+            "DawnDatetime": pd.Series(civil_dawn, index=group.index),
+            "DuskDatetime": pd.Series(civil_dusk, index=group.index),
+        }))
+    # Restore the chunk's row order after grouping by timezone
+    result = pd.concat(frames).loc[chunk.index]
+    return result, {"pid": os.getpid(), "rows": len(chunk), "seconds": time.perf_counter() - start}
+
+# Fleet twilight for every (light, date) pair, sharded over a process pool
+def compute_fleet_twilight(lights, dates, timezone=None, twilight_altitude=-6.0, processes=None, chunk_size=5000):
+    # lights needs EvariNum, lat and lon columns, timezone column is optional
+    lights = lights[["EvariNum", "lat", "lon"] + (["timezone"] if "timezone" in lights.columns else [])]
+    if "timezone" not in lights.columns:
+        lights = lights.assign(timezone=None)
+
+    # Fill missing timezones per row from the timezone argument or the lights' coordinates
+    missing = lights["timezone"].isna().to_numpy()
+    if missing.any():
+        timezones = lights["timezone"].astype(object).to_numpy(copy=True)
+        if timezone:
+            timezones[missing] = timezone
+        else:
+            timezones[missing] = get_timezones_for_latlons(
+                lights["lat"].values[missing], lights["lon"].values[missing]
+            )
+        lights = lights.assign(timezone=timezones)
+
+    # groupby drops None timezones, so fail here rather than losing rows in a worker
+    unresolved = lights.loc[lights["timezone"].isna(), "EvariNum"]
+    if len(unresolved):
+        raise ValueError(
+            f"Timezone could not be determined for {len(unresolved)} lights, EvariNum: {list(unresolved[:10])}"
+        )
+    work = lights.merge(pd.DataFrame({"date": pd.to_datetime(list(dates))}), how="cross")
+
+    chunks = [work.iloc[i:i + chunk_size] for i in range(0, len(work), chunk_size)]
+    if processes == 1:
+        # Run inline, e.g. on Lambda where multiprocessing pools are not available
+        outputs = [compute_twilight_chunk(chunk, twilight_altitude) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            outputs = list(executor.map(compute_twilight_chunk, chunks, repeat(twilight_altitude)))
+
+    header = ["EvariNum", "DawnDatetime", "DuskDatetime"]
+    if outputs:
+        df = pd.concat([output[0] for output in outputs], ignore_index=True)
+    else:
+        df = pd.DataFrame(columns=header)
+
+    # Per worker throughput of the run
+    throughput = pd.DataFrame([output[1] for output in outputs], columns=["pid", "rows", "seconds"])
+    throughput = throughput.groupby("pid").agg(tasks=("rows", "size"), rows=("rows", "sum"), seconds=("seconds", "sum"))
+    throughput["rows_per_sec"] = throughput["rows"] / throughput["seconds"]
+    return df[header], throughput.reset_index()
+
+# Shared TimezoneFinder, built on first use so its polygon data is only loaded once
+_timezone_finder = None
+
+# Function to lazily build and return the shared TimezoneFinder
+def get_timezone_finder():
+    global _timezone_finder
+    if _timezone_finder is None:
+        _timezone_finder = TimezoneFinder()
+    return _timezone_finder
+
+# Function to resolve the timezone of a grid cell, memoized per cell
+@lru_cache(maxsize=65536)
+def timezone_at_grid(lat, lon):
+    return get_timezone_finder().timezone_at(lng=lon, lat=lat)
+
+# Function to get the timezone strings for arrays of lat/lon, snapped to a grid_degrees grid
+def get_timezones_for_latlons(lats, lons, grid_degrees=0.01):
+    lats, lons = np.broadcast_arrays(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+    cells = np.stack([np.round(lats.ravel() / grid_degrees), np.round(lons.ravel() / grid_degrees)], axis=1)
+
+    # Only look up each distinct grid cell once, None where no timezone could be determined
+    unique_cells, inverse = np.unique(cells, axis=0, return_inverse=True)
+    timezones = np.array(
+        [timezone_at_grid(round(lat * grid_degrees, 6), round(lon * grid_degrees, 6)) for lat, lon in unique_cells],
+        dtype=object,
+    )
+    return timezones[inverse.ravel()].reshape(lats.shape)
+
 # Function to get the timezone string for a given lat/lon
-def get_timezone_for_latlon(lat, lon, date=None):
-    tf = TimezoneFinder()
-    timezone_str = tf.timezone_at(lng=lon, lat=lat)
+def get_timezone_for_latlon(lat, lon, date=None, verbose=True):
+    timezone_str = get_timezone_finder().timezone_at(lng=lon, lat=lat)
     if timezone_str is None:
         raise ValueError("Timezone could not be determined for the given coordinates.")
 
-    timezone = pytz.timezone(timezone_str)
-    if date is None:
-        date = datetime.now().date()
-    date_time = datetime(date.year, date.month, date.day, 0, 0)
-    localized_date = timezone.localize(date_time)
-    is_dst = localized_date.dst() != timedelta(0)
+    # Localizing is only needed for the DST message
+    if verbose:
+        timezone = pytz.timezone(timezone_str)
+        if date is None:
+            date = datetime.now().date()
+        date_time = datetime(date.year, date.month, date.day, 0, 0)
+        localized_date = timezone.localize(date_time)
+        is_dst = localized_date.dst() != timedelta(0)
 
-    if is_dst:
-        print(f"Daylight Saving Time is in effect for {timezone_str} on {date}.")
-    else:
-        print(f"Standard Time is in effect for {timezone_str} on {date}.")
+        if is_dst:
+            print(f"Daylight Saving Time is in effect for {timezone_str} on {date}.")
+        else:
+            print(f"Standard Time is in effect for {timezone_str} on {date}.")
 
-    return timezone_str
\ No newline at end of file
+    return timezone_str
@@ -10,6 +10,16 @@ Nautical twilight is defined as when the sun is between 6° and 12° below the h
 import math
 from datetime import datetime, timedelta
 
+import numpy as np
+
+# Sun angles (degrees, negative below horizon) computed by calculate_sun_events_array
+SUN_EVENT_ANGLES = {
+    "horizon": -0.833,
+    "civil": -6,
+    "nautical": -12,
+    "astronomical": -18,
+}
+
 def calculate_nautical_twilight(latitude, longitude, elevation=0, days=5):
     """
     Main function to calculate nautical twilight times for the next specified number of days.
@@ -158,6 +168,84 @@ def calculate_sun_time(date, latitude, longitude, elevation, angle, is_rising):
     
     return result_date
 
+def calculate_sun_events_array(dates, latitudes, longitudes, elevation=0):
+    """
+    Vectorized calculate_sun_time for every angle in SUN_EVENT_ANGLES in a single pass
+    
+    The mean anomaly, true longitude, right ascension and declination only depend on the
+    date and longitude, so they are computed once for the morning and once for the
+    evening approximation and shared by all angles.
+    
+    Args:
+        dates (array-like): Dates to calculate for (anything NumPy casts to datetime64[D])
+        latitudes (array-like): Latitudes in degrees
+        longitudes (array-like): Longitudes in degrees
+        elevation (float or array-like, optional): Elevation in meters. Defaults to 0.
+        
+    Returns:
+        numpy.ndarray: Structured array broadcast from the inputs with a "date" field and
+        datetime64[s] fields sunrise/sunset and civil/nautical/astronomical_dawn/dusk
+        (UTC time of day on the given date, like calculate_sun_time), NaT where the sun
+        never reaches the angle
+    """
+    dates, latitudes, longitudes, elevation = np.broadcast_arrays(
+        np.asarray(dates, dtype="datetime64[D]"),
+        np.asarray(latitudes, dtype=float),
+        np.asarray(longitudes, dtype=float),
+        np.asarray(elevation, dtype=float),
+    )
+    lat = np.radians(latitudes)
+    
+    # Day of year and approximate time
+    N = (dates - dates.astype("datetime64[Y]")).astype(np.int64) + 1
+    lng_hour = longitudes / 15
+    
+    # Approximately 1 minute per 1000m elevation, earlier at dawn and later at dusk
+    elevation_adjustment = np.where(elevation > 0, elevation / 1000 * 60, 0)
+    
+    fields = [("date", "datetime64[D]")]
+    for name in SUN_EVENT_ANGLES:
+        fields += [(event_field(name, True), "datetime64[s]"), (event_field(name, False), "datetime64[s]")]
+    events = np.empty(dates.shape, dtype=fields)
+    events["date"] = dates
+    
+    for is_rising in (True, False):
+        t = N + (((6 if is_rising else 18) - lng_hour) / 24)
+        
+        # Sun's mean anomaly and true longitude (0-360 range)
+        M = (0.9856 * t) - 3.289
+        L = np.mod(M + (1.916 * np.sin(np.radians(M))) + (0.020 * np.sin(np.radians(2 * M))) + 282.634 + 360, 360)
+        
+        # Sun's right ascension in the same quadrant as L, in hours
+        RA = np.mod(np.degrees(np.arctan(0.91764 * np.tan(np.radians(L)))) + 360, 360)
+        RA = (RA + (np.floor(L / 90) * 90 - np.floor(RA / 90) * 90)) / 15
+        
+        # Sun's declination
+        sin_dec = 0.39782 * np.sin(np.radians(L))
+        cos_dec = np.cos(np.arcsin(sin_dec))
+        
+        for name, angle in SUN_EVENT_ANGLES.items():
+            # Sun's local hour angle, NaN where the sun never reaches the angle
+            cos_H = (math.sin(math.radians(angle)) - (sin_dec * np.sin(lat))) / (cos_dec * np.cos(lat))
+            reached = np.abs(cos_H) <= 1
+            H = np.degrees(np.arccos(np.clip(cos_H, -1, 1)))
+            if is_rising:
+                H = 360 - H
+            
+            # Local mean time -> UTC hours in 0-24 range -> whole seconds into the day
+            UT = np.mod(H / 15 + RA - (0.06571 * t) - 6.622 - lng_hour + 24, 24)
+            seconds = np.floor(UT * 3600) + (-elevation_adjustment if is_rising else elevation_adjustment)
+            times = dates.astype("datetime64[s]") + seconds.astype(np.int64)
+            events[event_field(name, is_rising)] = np.where(reached, times, np.datetime64("NaT"))
+    
+    return events
+
+def event_field(name, is_rising):
+    """Name of the calculate_sun_events_array field for an angle name and direction"""
+    if name == "horizon":
+        return "sunrise" if is_rising else "sunset"
+    return name + ("_dawn" if is_rising else "_dusk")
+
 def format_date(date):
     """Format date as YYYY-MM-DD"""
     return date.strftime("%Y-%m-%d")
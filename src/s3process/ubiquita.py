@@ -8,11 +8,23 @@
 # ____________________________________________________________________________________
 
 
-import requests
 import time
 import os
 import json
 import csv
+import threading
+from s3process.sessions import get_session
+
+# Token cache -> module level so warm Lambda invocations reuse tokens
+# (client_id, token_url) -> (access_token, refresh_at)
+_token_cache = {}
+# (client_id, token_url) -> lock, so refreshes for different keys do not wait on each other
+_token_locks = {}
+_token_locks_lock = threading.Lock()
+# Refresh a token this many seconds (at most 10% of its lifetime) before it expires
+TOKEN_REFRESH_MARGIN = 60
+# Lifetime assumed when the token response has no expires_in
+DEFAULT_TOKEN_LIFETIME = 300
 
 # Helper Function: write_json
 # Writes response_body to json data
@@ -55,8 +67,9 @@ def get_organized_id_and_dim(in_data):
         outdata["data"].append(distilled_data)
     return outdata
 
-# Step 1: Requesting a Bearer Token
-def get_bearer_token(client_id, client_secret, token_api):
+# Helper Function: request_token
+# POSTs client credentials, returns access token and its lifetime in seconds
+def request_token(client_id, client_secret, token_api):
     # Set up the payload with client credentials
     payload = {
         'grant_type': 'client_credentials',
@@ -65,16 +78,60 @@ def get_bearer_token(client_id, client_secret, token_api):
     }
 
     # Send a POST request to the token endpoint
-    response = requests.post(token_api, data=payload)
+    response = get_session().post(token_api, data=payload)
 
     # Check if the request was successful
     if response.status_code == 200:
         # Parse and return the access token
         token_info = response.json()
-        return token_info['access_token']
+        lifetime = float(token_info.get('expires_in') or DEFAULT_TOKEN_LIFETIME)
+        return token_info['access_token'], lifetime
     else:
         raise Exception("Error fetching token: " + response.text)
 
+# Step 1: Requesting a Bearer Token
+def get_bearer_token(client_id, client_secret, token_api):
+    token, _ = request_token(client_id, client_secret, token_api)
+    return token
+
+# Error raised when the API rejects a bearer token (HTTP 401)
+class UnauthorizedError(Exception):
+    pass
+
+# Helper Function: token_lock
+# Returns the lock of one (client_id, token_url) key, created on first use
+def token_lock(key):
+    with _token_locks_lock:
+        return _token_locks.setdefault(key, threading.Lock())
+
+# Step 1 (cached): Bearer Token reused until shortly before it expires
+# The key's lock makes concurrent callers wait for one refresh instead of each requesting
+def get_cached_bearer_token(client_id, client_secret, token_api):
+    key = (client_id, token_api)
+    with token_lock(key):
+        cached = _token_cache.get(key)
+        if cached is not None and time.time() < cached[1]:
+            return cached[0]
+        token, lifetime = request_token(client_id, client_secret, token_api)
+        margin = min(TOKEN_REFRESH_MARGIN, lifetime * 0.1)
+        _token_cache[key] = (token, time.time() + lifetime - margin)
+        return token
+
+# Helper Function: invalidate_bearer_token
+# Drops a cached token the server rejected, unless another caller already replaced it
+def invalidate_bearer_token(client_id, token_api, bearer_token):
+    key = (client_id, token_api)
+    with token_lock(key):
+        cached = _token_cache.get(key)
+        if cached is not None and cached[0] == bearer_token:
+            del _token_cache[key]
+
+# Helper Function: clear_token_cache
+# Drops cached tokens, e.g. after credentials are rotated
+def clear_token_cache():
+    with _token_locks_lock:
+        _token_cache.clear()
+
 # Step 2: Use the Bearer Token to make an authorized request
 def make_authorized_request(bearer_token, url, params):
     headers = {
@@ -82,20 +139,30 @@ def make_authorized_request(bearer_token, url, params):
     }
 
     # Make a GET request to a protected resource
-    response = requests.get(url, headers=headers, params=params)
+    response = get_session().get(url, headers=headers, params=params)
 
     # Check if the request was successful
     if response.status_code == 200:
         return response.json()
+    elif response.status_code == 401:
+        raise UnauthorizedError("Error making API request: " + response.text)
     else:
         raise Exception("Error making API request: " + response.text)
 
+# Step 2 (cached): Authorized request with the cached Bearer Token
+# A token revoked before it expires is dropped and the request retried once with a new one
+def make_cached_authorized_request(client_id, client_secret, token_url, url, params):
+    bearer_token = get_cached_bearer_token(client_id, client_secret, token_url)
+    try:
+        return make_authorized_request(bearer_token, url, params)
+    except UnauthorizedError:
+        invalidate_bearer_token(client_id, token_url, bearer_token)
+        bearer_token = get_cached_bearer_token(client_id, client_secret, token_url)
+        return make_authorized_request(bearer_token, url, params)
+
 # Function: query the nodelist url for all IDs/DIMs
 # First Registered API Request
 def make_nodeslist_request(url, client_id, client_secret, token_url):
-    # Get the Bearer Token
-    bearer_token = get_bearer_token(client_id, client_secret, token_url)
-
     # Make an authorized API request
     get_nodes_endpoint = url + "getnodeslist"
     print(get_nodes_endpoint)
@@ -107,16 +174,13 @@ def make_nodeslist_request(url, client_id, client_secret, token_url):
         "per_page": 1
     }
 
-    api_response = make_authorized_request(bearer_token, get_nodes_endpoint, params)
+    api_response = make_cached_authorized_request(client_id, client_secret, token_url, get_nodes_endpoint, params)
 
     print(len(api_response))
 
     return api_response
 
 def make_node_request_by_id(url, client_id, client_secret, token_url, id):
-    # Get the Bearer Token
-    bearer_token = get_bearer_token(client_id, client_secret, token_url)
-
     # Make an authorized API request
     get_nodes_id_endpoint = url + "nodes/" + id
     print(get_nodes_id_endpoint)
@@ -129,14 +193,11 @@ def make_node_request_by_id(url, client_id, client_secret, token_url, id):
         "type" : "light"
     }
 
-    api_response = make_authorized_request(bearer_token, get_nodes_id_endpoint, params)
+    api_response = make_cached_authorized_request(client_id, client_secret, token_url, get_nodes_id_endpoint, params)
 
     return api_response
 
 def make_post_dim_request_to_light_by_id(url, client_id, client_secret, token_url, id, dim_value):
-    # Get the Bearer Token
-    bearer_token = get_bearer_token(client_id, client_secret, token_url)
-
     # Make an authorized API request
     post_dim_endpoint = url + "nodes/setLightDim/"
     print(post_dim_endpoint)
@@ -153,5 +214,5 @@ def make_post_dim_request_to_light_by_id(url, client_id, client_secret, token_ur
     }
 
 
-    api_response = make_authorized_request(bearer_token, post_dim_endpoint, params)
+    api_response = make_cached_authorized_request(client_id, client_secret, token_url, post_dim_endpoint, params)
     return api_response
\ No newline at end of file
@@ -0,0 +1,41 @@
+# Package: s3_process
+# Module: tests/conftest.py
+
+# Description: Shared fixtures. http_server runs a request handler on a local
+# ThreadingHTTPServer for tests that need a vendor or S3 stand-in.
+
+
+# ____________________________________________________________________________________
+
+
+import http.server
+import threading
+
+import pytest
+
+
+# Function Name: http_server
+# Purpose: Fixture factory, http_server(handler) serves a BaseHTTPRequestHandler subclass
+# on 127.0.0.1 with an ephemeral port from a background thread, with request logging
+# silenced. Tests keep their state as attributes on the returned server (with
+# server.lock to guard it) and build urls from server.url
+# Return: the started http.server.ThreadingHTTPServer, shut down and closed on teardown
+@pytest.fixture
+def http_server():
+    servers = []
+
+    def start(handler):
+        quiet = type(handler.__name__, (handler,), {"log_message": lambda *args: None})
+        httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), quiet)
+        httpd.daemon_threads = True
+        httpd.lock = threading.Lock()
+        httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/"
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        servers.append(httpd)
+        return httpd
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
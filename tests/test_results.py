@@ -0,0 +1,119 @@
+# Package: s3_process
+# Module: tests/test_results.py
+
+# Description: results parsing helpers that need no HTTP server.
+
+
+# ____________________________________________________________________________________
+
+
+import io
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from s3process import results
+
+RESULTS_CSV = b"EvariNum,DIM,SUM\n1,50,2.5\n2,100,3.0\n3,0,1.0\n"
+
+
+def test_process_results_stream_closes_stream():
+    stream = io.BytesIO(RESULTS_CSV)
+    chunks = list(results.process_results_stream(stream, chunk_rows=2))
+
+    assert [len(df) for df in chunks] == [2, 1]
+    assert stream.closed
+
+
+def test_process_results_stream_closes_stream_when_abandoned():
+    stream = io.BytesIO(RESULTS_CSV)
+    chunks = results.process_results_stream(stream, chunk_rows=1)
+    next(chunks)
+    chunks.close()
+
+    assert stream.closed
+
+
+# Class Name: FakeResponse
+# Purpose: Minimal stand-in for requests.Response as used by DownloadCache.store
+class FakeResponse:
+    def __init__(self, text, headers):
+        self.text = text
+        self.headers = headers
+
+
+def test_download_cache_stores_revalidatable_bodies(tmp_path):
+    cache = results.DownloadCache(str(tmp_path))
+    cache.store("http://s3/results.csv", FakeResponse("a,b,c\n", {"ETag": '"v1"'}))
+
+    assert cache.load("http://s3/results.csv") == "a,b,c\n"
+    assert cache.conditional_headers("http://s3/results.csv") == {
+        "If-None-Match": '"v1"'
+    }
+
+
+def test_download_cache_skips_bodies_without_validators(tmp_path):
+    cache = results.DownloadCache(str(tmp_path))
+    cache.store("http://s3/results.csv", FakeResponse("old\n", {"ETag": '"v1"'}))
+    cache.store("http://s3/results.csv", FakeResponse("new\n", {}))
+
+    assert cache.load("http://s3/results.csv") is None
+    assert cache.conditional_headers("http://s3/results.csv") == {}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_frame_cache_reload_is_zero_copy_and_private(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    cache = results.FrameCache(str(tmp_path))
+    csv = "EvariNum,DIM,SUM\n" + "\n".join(
+        f"{i},{i % 256},{i / 2}" for i in range(5000)
+    )
+    df = results.process_results(csv, typed=True)
+    cache.store("http://s3/results.csv", '"v1"', {"typed": True}, df)
+
+    before = pa.total_allocated_bytes()
+    tracemalloc.start()
+    loaded = cache.load("http://s3/results.csv", '"v1"', {"typed": True})
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    pd.testing.assert_frame_equal(loaded, df)
+    # Numeric columns are views of the mapping, not copies
+    assert pa.total_allocated_bytes() - before < 1024
+    assert peak < df.memory_usage(index=False).sum() / 4
+
+    # Writes stay in the caller's copy-on-write pages
+    loaded.loc[0, "SUM"] = -1.0
+    reloaded = cache.load("http://s3/results.csv", '"v1"', {"typed": True})
+    assert reloaded.loc[0, "SUM"] == 0.0
+
+
+def hours_frame(ids):
+    dusk = pd.Timestamp("2026-01-01 17:00")
+    return pd.DataFrame(
+        {
+            "EvariNum": ids,
+            "DuskDatetime": [dusk] * len(ids),
+            "DawnDatetime": [dusk + pd.Timedelta(hours=14)] * len(ids),
+        }
+    )
+
+
+def test_build_schedule_rejects_out_of_range_dim():
+    results_df = pd.DataFrame({"EvariNum": ["1", "2"], "DIM": ["50", "300"]})
+
+    with pytest.raises(ValueError, match="DIM"):
+        results.build_schedule(results_df, hours_frame(["1", "2"]))
+
+
+def test_schedule_lookup_ignores_non_integer_ids():
+    results_df = results.process_results(RESULTS_CSV.decode(), typed=True)
+    schedule = results.build_schedule(results_df, hours_frame(["1", "2", "3"]))
+
+    assert schedule.lookup(2)["dim"].tolist() == [100]
+    assert "2" in schedule
+    assert "abc" not in schedule
+    assert None not in schedule
+    assert 2**70 not in schedule
+    assert schedule.lookup("abc").empty
@@ -0,0 +1,160 @@
+# Package: s3_process
+# Module: tests/test_results_fetch.py
+
+# Description: results.fetch against a local http.server stand-in for S3 that serves
+# HEAD, Range (206) and plain GET responses.
+
+
+# ____________________________________________________________________________________
+
+
+import gzip
+import http.server
+
+import pytest
+import requests
+
+from s3process import results
+
+CSV = "".join(f"{i},{i % 101},{i * 0.5}\n" for i in range(20000)).encode()
+OBJECTS = {
+    "/results.csv": CSV,
+    "/results.csv.gz": gzip.compress(CSV),
+}
+
+
+# Class Name: S3StandIn
+# Purpose: Serve OBJECTS with Content-Length and Accept-Ranges, answering Range requests
+# with 206 and unknown paths with 404. A Range starting at server.fail_range_start is
+# answered with 503. Every request is recorded on the server
+class S3StandIn(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def respond(self, send_body):
+        self.server.requests.append((self.command, self.headers.get("Range")))
+        body = OBJECTS.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        status = 200
+        byte_range = self.headers.get("Range")
+        if byte_range:
+            start, end = (int(value) for value in byte_range[6:].split("-"))
+            if start == self.server.fail_range_start:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = body[start : end + 1]
+            status = 206
+        self.send_response(status)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+
+@pytest.fixture
+def server(http_server):
+    httpd = http_server(S3StandIn)
+    httpd.requests = []
+    httpd.fail_range_start = None
+    return httpd
+
+
+def url(server, path):
+    return server.url + path.lstrip("/")
+
+
+def range_requests(server):
+    return [byte_range for command, byte_range in server.requests if byte_range]
+
+
+def test_fetch_ranged(server):
+    body = results.fetch(url(server, "/results.csv"), parts=4, min_part_size=1024)
+
+    assert bytes(body) == CSV
+    # Parts arrive in any order, together they must tile the object
+    spans = sorted(
+        tuple(int(value) for value in byte_range[6:].split("-"))
+        for byte_range in range_requests(server)
+    )
+    assert len(spans) == 4
+    assert spans[0][0] == 0 and spans[-1][1] == len(CSV) - 1
+    assert all(end + 1 == start for (_, end), (start, _) in zip(spans, spans[1:]))
+
+
+def test_fetch_small_object_single_get(server):
+    body = results.fetch(url(server, "/results.csv"), min_part_size=len(CSV))
+
+    assert bytes(body) == CSV
+    assert range_requests(server) == []
+
+
+def test_fetch_ranged_gzip(server):
+    body = results.fetch(url(server, "/results.csv.gz"), parts=3, min_part_size=1024)
+
+    assert bytes(body) == CSV
+    assert len(range_requests(server)) > 1
+
+
+def test_fetch_gzip_single_get(server):
+    body = results.fetch(url(server, "/results.csv.gz"), parts=1)
+
+    assert bytes(body) == CSV
+    assert range_requests(server) == []
+
+
+def test_fetch_not_found(server):
+    assert results.fetch(url(server, "/missing.csv")) is False
+
+
+def test_fetch_failed_part_returns_false(server, capsys):
+    server.fail_range_start = 0
+
+    assert (
+        results.fetch(url(server, "/results.csv"), parts=4, min_part_size=1024) is False
+    )
+    assert "503" in capsys.readouterr().out
+
+
+def test_fetch_closes_own_session(server, monkeypatch):
+    sessions = []
+
+    class TrackedSession(requests.Session):
+        closed = False
+
+        def __init__(self):
+            super().__init__()
+            sessions.append(self)
+
+        def close(self):
+            self.closed = True
+            super().close()
+
+    monkeypatch.setattr(results.requests, "Session", TrackedSession)
+    results.fetch(url(server, "/results.csv"), parts=2, min_part_size=1024)
+    results.fetch(url(server, "/missing.csv"))
+
+    assert len(sessions) == 2
+    assert all(session.closed for session in sessions)
+
+
+def test_fetch_keeps_caller_session_open(server):
+    session = requests.Session()
+    close = session.close
+    session.close = lambda: pytest.fail("fetch closed the caller's session")
+    body = results.fetch(url(server, "/results.csv"), session=session)
+    close()
+
+    assert bytes(body) == CSV
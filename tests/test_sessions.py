@@ -0,0 +1,111 @@
+# Package: s3_process
+# Module: tests/test_sessions.py
+
+# Description: VendorSession host throttling against a local http.server that returns
+# 429 with Retry-After before succeeding.
+
+
+# ____________________________________________________________________________________
+
+
+import http.server
+import threading
+import time
+
+import pytest
+
+from s3process import sessions
+from s3process.sessions import VendorSession, retry_after_seconds
+
+
+# Class Name: Throttling
+# Purpose: Answer the first server.throttle requests with 429 and Retry-After, then 200.
+# Every request time is recorded on the server
+class Throttling(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.times.append(time.monotonic())
+            throttled = self.server.throttle > 0
+            self.server.throttle -= 1
+        self.send_response(429 if throttled else 200)
+        if throttled:
+            self.send_header("Retry-After", str(self.server.retry_after))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def server(http_server):
+    httpd = http_server(Throttling)
+    httpd.times = []
+    httpd.throttle = 0
+    httpd.retry_after = 0.3
+    return httpd
+
+
+def make_session(**overrides):
+    options = {
+        "pool_size": 4,
+        "retries": 0,
+        "backoff_factor": 0,
+        "timeout": (5, 5),
+        "host_timeouts": {},
+        "initial_concurrency": 1,
+        "max_concurrency": 4,
+        "throttle_retries": 3,
+    }
+    options.update(overrides)
+    return VendorSession(**options)
+
+
+def test_retry_after_pauses_waiting_requests(server, monkeypatch):
+    server.throttle = 1
+    session = make_session()
+
+    # Widen the gap between receiving the 429 and recording it
+    def slow_retry_after(response, default):
+        time.sleep(0.1)
+        return retry_after_seconds(response, default)
+
+    monkeypatch.setattr(sessions, "retry_after_seconds", slow_retry_after)
+    url = server.url
+
+    # One slot: the second thread waits on the limiter while the first gets the 429
+    threads = [threading.Thread(target=session.get, args=(url,)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+
+    # No request may reach the host inside the Retry-After window of the 429
+    first, *rest = server.times
+    assert len(rest) == 2
+    assert min(rest) - first >= server.retry_after - 0.05
+
+
+def test_limit_halves_on_429_and_recovers(server):
+    server.throttle = 1
+    session = make_session(initial_concurrency=4)
+    server.retry_after = 0
+    url = server.url
+
+    assert session.get(url).status_code == 200
+    limiter = session.throttle("127.0.0.1")[1]
+    assert limiter.limit == pytest.approx(2 + 1 / 2)
+
+    for _ in range(20):
+        session.get(url)
+    assert limiter.limit == limiter.maximum
+
+
+def test_429_returned_after_throttle_retries(server):
+    server.throttle = 10
+    server.retry_after = 0
+    session = make_session(throttle_retries=2)
+    url = server.url
+
+    assert session.get(url).status_code == 429
+    assert len(server.times) == 3
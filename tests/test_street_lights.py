@@ -0,0 +1,119 @@
+# Package: s3_process
+# Module: tests/test_street_lights.py
+
+# Description: street_lights helpers, and dimming reconciliation against a local
+# http.server stand-in for the SmartLinx API.
+
+
+# ____________________________________________________________________________________
+
+
+import http.server
+import json
+
+import pytest
+
+from s3process import street_lights
+
+
+# Class Name: SmartLinx
+# Purpose: GET streetlight/{id}/dimminglevel answers server.levels[id], a (status, body)
+# pair where a bytes body is sent as is and anything else as JSON. POST records the id
+# and level in server.posts
+class SmartLinx(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def send(self, status, body):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def light_id(self):
+        return self.path.split("?")[0].split("/")[-2]
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.reads.append(self.light_id())
+        self.send(*self.server.levels[self.light_id()])
+
+    def do_POST(self):
+        level = int(self.path.split("level=")[1].split("&")[0])
+        with self.server.lock:
+            self.server.posts[self.light_id()] = level
+        self.send(200, {"ok": True})
+
+
+@pytest.fixture
+def server(http_server, monkeypatch):
+    httpd = http_server(SmartLinx)
+    httpd.levels = {}
+    httpd.reads = []
+    httpd.posts = {}
+    monkeypatch.setattr(street_lights, "API_ENDPOINT", httpd.url + "api/v2/")
+    monkeypatch.setenv("SMART_TOKEN", "token")
+    return httpd
+
+
+def test_percentile_nearest_rank():
+    ordered = list(range(1, 101))
+
+    assert street_lights.percentile(ordered, 0.5) == 50
+    assert street_lights.percentile(ordered, 0.95) == 95
+    assert street_lights.percentile(ordered, 0.99) == 99
+    assert street_lights.percentile(ordered, 1) == 100
+    assert street_lights.percentile(ordered, 0) == 1
+
+
+def test_percentile_small_lists():
+    assert street_lights.percentile([], 0.5) is None
+    assert street_lights.percentile([7], 0.99) == 7
+    assert street_lights.percentile([1, 2], 0.5) == 1
+    assert street_lights.percentile([1, 2, 3, 4], 0.5) == 2
+
+
+def test_reconcile_sends_only_changed_levels(server):
+    server.levels = {
+        id: (200, {"value": level}) for id, level in zip("ABC", (50, 20, 70))
+    }
+    plan = [("A", 50, 60), ("B", 80, 60), ("C", 70, 60)]
+
+    report = street_lights.post_dimming_changes(plan, max_workers=2)
+
+    assert sorted(server.reads) == ["A", "B", "C"]
+    assert server.posts == {"B": 80}
+    assert report["stats"]["planned"] == 3
+    assert report["stats"]["skipped"] == 2
+    assert report["stats"]["count"] == report["stats"]["succeeded"] == 1
+
+
+def test_reconcile_always_sends_unknown_levels(server):
+    server.levels = {"A": (200, {}), "B": (200, []), "C": (200, {"value": 30})}
+    plan = [("A", 30, 60), ("B", 30, 60), ("C", 30, 60)]
+
+    report = street_lights.post_dimming_changes(plan, max_workers=2)
+
+    assert server.posts == {"A": 30, "B": 30}
+    assert report["stats"]["skipped"] == 1
+    assert report["stats"]["count"] == 2
+
+
+def test_reconcile_sends_lights_whose_read_failed(server, capsys):
+    server.levels = {
+        "A": (404, {"error": "not found"}),
+        "B": (200, b"not json"),
+        "C": (200, {"level": 30}),
+        "D": (200, {"value": 30}),
+    }
+    plan = [(id, 30, 60) for id in ("A", "B", "C", "D")]
+
+    report = street_lights.post_dimming_changes(plan, max_workers=2)
+
+    # One bad light neither aborts the run nor is mistaken for being at its target
+    assert server.posts == {"A": 30, "B": 30, "C": 30}
+    assert report["stats"]["skipped"] == 1
+    assert report["stats"]["succeeded"] == 3
+    output = capsys.readouterr().out
+    assert all(f"LightPoint {id}" in output for id in ("A", "B", "C"))
@@ -0,0 +1,119 @@
+# Package: s3_process
+# Module: tests/test_ubiquita.py
+
+# Description: Ubiquita token cache against a local http.server that issues
+# client-credentials tokens and can revoke them before they expire.
+
+
+# ____________________________________________________________________________________
+
+
+import http.server
+import json
+import threading
+import time
+
+import pytest
+
+from s3process import ubiquita
+
+
+# Class Name: TokenServer
+# Purpose: POST issues a new token (after server.token_delay seconds) and, unless
+# server.keep_tokens is set, revokes older ones. GET answers 200 for a valid bearer token
+# and 401 otherwise
+class TokenServer(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.server.token_delay)
+        with self.server.lock:
+            self.server.issued += 1
+            token = f"token-{self.server.issued}"
+            if not self.server.keep_tokens:
+                self.server.valid.clear()
+            self.server.valid.add(token)
+        self.send(200, {"access_token": token, "expires_in": 3600})
+
+    def do_GET(self):
+        token = self.headers["Authorization"].split(" ", 1)[1]
+        if token in self.server.valid:
+            self.send(200, {"data": [], "token": token})
+        else:
+            self.send(401, {"error": "invalid token"})
+
+
+@pytest.fixture
+def server(http_server):
+    httpd = http_server(TokenServer)
+    httpd.issued = 0
+    httpd.valid = set()
+    httpd.keep_tokens = False
+    httpd.token_delay = 0
+    ubiquita.clear_token_cache()
+    yield httpd
+    ubiquita.clear_token_cache()
+
+
+def test_token_reused_across_calls(server):
+    url = server.url
+    for _ in range(3):
+        ubiquita.make_node_request_by_id(url, "client", "secret", url + "token", "1")
+
+    assert server.issued == 1
+
+
+def test_revoked_token_is_replaced_once(server):
+    url = server.url
+    first = ubiquita.make_node_request_by_id(
+        url, "client", "secret", url + "token", "1"
+    )
+
+    # Revoke the cached token before it expires, as a credential rotation would
+    server.valid.clear()
+    second = ubiquita.make_node_request_by_id(
+        url, "client", "secret", url + "token", "1"
+    )
+
+    assert first["token"] == "token-1"
+    assert second["token"] == "token-2"
+    assert server.issued == 2
+
+
+def test_rejected_fresh_token_raises(server, monkeypatch):
+    url = server.url
+    monkeypatch.setattr(ubiquita, "request_token", lambda *args: ("never-valid", 3600))
+
+    with pytest.raises(ubiquita.UnauthorizedError):
+        ubiquita.make_node_request_by_id(url, "client", "secret", url + "token", "1")
+
+
+def test_refreshes_for_different_keys_run_in_parallel(server):
+    server.keep_tokens = True
+    server.token_delay = 0.3
+    url = server.url
+
+    threads = [
+        threading.Thread(
+            target=ubiquita.get_cached_bearer_token,
+            args=(client_id, "secret", url + "token"),
+        )
+        for client_id in ("client-a", "client-b", "client-c")
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert server.issued == 3
+    assert time.monotonic() - start < 2 * server.token_delay